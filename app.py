@@ -6,25 +6,37 @@ defining routes, API endpoints, and business logic.
 """
 
 import os
-import json
 import uuid
-import sqlite3
 import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_from_directory
+from functools import lru_cache
+from flask import Flask, Request, render_template, request, redirect, url_for, send_from_directory, g
+from werkzeug.exceptions import BadRequest
+from jinja2 import FileSystemBytecodeCache
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, cross_validate
 from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.svm import SVR
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.pipeline import Pipeline
 import joblib
 import pickle
+import orjson
+import msgpack
+from celery import Celery
+from cachetools import TTLCache, LRUCache, cached
+from flask_compress import Compress
 
 # Local imports
-from utils.data_processor import validate_csv, transform_data, analyze_data
-from utils.model_trainer import train_model, evaluate_model
+from utils.data_processor import prepare_dataset, save_csv_stream, validate_csv_stream_header, load_dataset, parquet_path_for, analyze_data
+from utils.db_pool import ConnectionPool
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -45,24 +57,160 @@ else:
     app.config['DATABASE'] = 'data/dashboard.db'
 
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+
+# Static assets are versioned in their URLs, so browsers may cache them for a year
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))  # For session management
 
+# Compress JSON API responses (brotli when the client accepts it, else gzip)
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 2048
+Compress(app)
+
+# Cache compiled templates on disk so each worker process skips re-parsing them
+jinja_cache_dir = os.path.join(tempfile.gettempdir(), 'jinja_cache')
+os.makedirs(jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+
+# Footer year for rendered pages, computed once and rolled over at New Year
+CURRENT_YEAR = datetime.now().year
+next_year_start = datetime(CURRENT_YEAR + 1, 1, 1).timestamp()
+
+# Background task queue (model training runs in Celery workers when a broker is set)
+app.config['CELERY_BROKER_URL'] = os.environ.get('CELERY_BROKER_URL')
+app.config['CELERY_RESULT_BACKEND'] = os.environ.get('CELERY_RESULT_BACKEND', app.config['CELERY_BROKER_URL'])
+
+celery = Celery(app.name, broker=app.config['CELERY_BROKER_URL'], backend=app.config['CELERY_RESULT_BACKEND'])
+celery.conf.task_routes = {'train_model': {'queue': 'train'}}
+
+# Without a broker, training falls back to running inside the request
+use_task_queue = bool(app.config['CELERY_BROKER_URL'])
+
+# Without a broker, training runs on this many background threads per process
+# (0 trains inside the request, which serverless platforms require)
+app.config['TRAIN_WORKERS'] = int(os.environ.get('TRAIN_WORKERS', 0 if is_production else 2))
+training_executor = None
+if not use_task_queue and app.config['TRAIN_WORKERS'] > 0:
+    training_executor = ThreadPoolExecutor(max_workers=app.config['TRAIN_WORKERS'], thread_name_prefix='train')
+
+# Cores used by a single training run (-1 for all)
+app.config['TRAIN_N_JOBS'] = int(os.environ.get('TRAIN_N_JOBS', -1))
+
+# Larger datasets are trained on a random sample of this many rows
+app.config['MAX_TRAIN_ROWS'] = int(os.environ.get('MAX_TRAIN_ROWS', 200000))
+
+# Model types that can't be fit on sparse matrices
+DENSE_INPUT_MODELS = {'GradientBoosting'}
+
+# Number of features reported in a training result's feature importance
+MAX_FEATURE_IMPORTANCES = 20
+
+# Permutation importance predicts once per feature and repeat, so score it on
+# a bounded test sample with few repeats
+PERMUTATION_REPEATS = 3
+PERMUTATION_MAX_SAMPLES = 1000
+
+# Picks the predictions shown after training (Generator methods are thread-safe)
+sample_rng = np.random.default_rng()
+
 # Ensure required directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['MODELS_FOLDER'], exist_ok=True)
 os.makedirs('data', exist_ok=True)
 
+# Uploaded files are spooled straight into the upload folder under this suffix
+UPLOAD_SPOOL_SUFFIX = '.part'
+
+class UploadRequest(Request):
+    """Request whose uploaded files are written to disk next to their final location"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        """Spool each uploaded file into the upload folder instead of a temporary file"""
+        spooled = tempfile.NamedTemporaryFile('wb+', dir=app.config['UPLOAD_FOLDER'], suffix=UPLOAD_SPOOL_SUFFIX, delete=False)
+        # Track the file as soon as it exists, so it is removed even if parsing the body fails
+        self.spooled_uploads.append(spooled)
+        return spooled
+    
+    @property
+    def spooled_uploads(self):
+        """Files spooled for this request so far"""
+        return vars(self).setdefault('_spooled_uploads', [])
+
+app.request_class = UploadRequest
+
 # Create a directory for storing models if it doesn't exist
 if not os.path.exists('models'):
     os.makedirs('models')
 
+# JSON encoding for API responses
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def ojsonify(obj, status=200):
+    """Create a JSON response encoded with orjson, which handles NumPy values natively"""
+    return app.response_class(orjson.dumps(obj, option=ORJSON_OPTIONS), status=status, mimetype='application/json')
+
+def request_json():
+    """Parse the JSON request body with orjson, returning None if it is empty"""
+    body = request.get_data()
+    if not body:
+        return None
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise BadRequest('Request body is not valid JSON')
+
+# Encoding for analysis results stored in the datasets table
+def pack_stats(obj):
+    """Encode an analysis result for storage as a msgpack BLOB"""
+    return msgpack.packb(obj, use_bin_type=True)
+
+def unpack_stats(blob):
+    """Decode a stored analysis result, accepting rows written as JSON text"""
+    if blob is None:
+        return {}
+    if isinstance(blob, str):
+        return orjson.loads(blob)
+    return msgpack.unpackb(blob, raw=False)
+
+@app.before_request
+def refresh_current_year():
+    """Advance CURRENT_YEAR once the calendar year has changed"""
+    global CURRENT_YEAR, next_year_start
+    if time.time() >= next_year_start:
+        CURRENT_YEAR = datetime.now().year
+        next_year_start = datetime(CURRENT_YEAR + 1, 1, 1).timestamp()
+
 # Database initialization
+# Requests check connections out of a shared pool instead of opening their own
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+db_pool = ConnectionPool(app.config['DATABASE'], max_size=app.config['DB_POOL_SIZE'])
+
 def get_db_connection():
-    """Get a connection to the SQLite database"""
-    conn = sqlite3.connect(app.config['DATABASE'])
-    conn.row_factory = sqlite3.Row
+    """Get the pooled SQLite connection for the current app context, checking it out on first use"""
+    conn = g.get('_db')
+    if conn is None:
+        conn = g._db = db_pool.acquire()
     return conn
 
+@app.teardown_request
+def remove_spooled_uploads(exception):
+    """Delete spooled upload files that the request did not move into place"""
+    # Includes files left by a body that failed to parse (disconnects, size limit)
+    for spooled in vars(request._get_current_object()).get('_spooled_uploads', ()):
+        spooled.close()
+        if os.path.exists(spooled.name):
+            os.remove(spooled.name)
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the app context's connection to the pool"""
+    conn = g.pop('_db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
 def init_db():
     """Initialize the database with required tables"""
     conn = get_db_connection()
@@ -73,21 +221,227 @@ def init_db():
         path TEXT NOT NULL,
         upload_date TEXT NOT NULL,
         processed INTEGER DEFAULT 0,
-        stats TEXT,
-        filter_options TEXT
+        stats BLOB,
+        filter_options BLOB
+    )
+    ''')
+    
+    # Add columns introduced after the original schema to existing databases
+    existing_columns = {row['name'] for row in conn.execute('PRAGMA table_info(datasets)')}
+    for column, column_type in [('parquet_path', 'TEXT'), ('row_count', 'INTEGER'), ('column_count', 'INTEGER'), ('column_types', 'BLOB'), ('version', 'INTEGER DEFAULT 0')]:
+        if column not in existing_columns:
+            conn.execute(f'ALTER TABLE datasets ADD COLUMN {column} {column_type}')
+    
+    # Serves the recent datasets list on the landing page
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_datasets_upload ON datasets(upload_date DESC)')
+    
+    # Saved model metadata; the model itself is a file at model_path
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS models (
+        id TEXT PRIMARY KEY,
+        dataset_id TEXT NOT NULL,
+        name TEXT,
+        model_type TEXT,
+        model_path TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        info BLOB NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_models_dataset ON models(dataset_id, created_at DESC)')
+    
+    # State of training jobs run on background threads, visible to every worker process
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS training_jobs (
+        id TEXT PRIMARY KEY,
+        dataset_id TEXT NOT NULL,
+        state TEXT NOT NULL,
+        stage TEXT,
+        result BLOB,
+        created_at TEXT NOT NULL
     )
     ''')
+    
     conn.commit()
-    conn.close()
+
+def import_legacy_model_files(conn):
+    """
+    Copy model info files written before models were stored in the database.
+    
+    Runs once per database; the schema version is bumped afterwards so later
+    startups don't scan the models folder.
+    """
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= 1:
+        return
+    
+    models_dir = app.config['MODELS_FOLDER']
+    if os.path.exists(models_dir):
+        for filename in os.listdir(models_dir):
+            if not filename.endswith('_info.json'):
+                continue
+            try:
+                with open(os.path.join(models_dir, filename), 'rb') as f:
+                    model_data = orjson.loads(f.read())
+                insert_model_row(conn, model_data)
+            except Exception as e:
+                print(f"Error importing model {filename}: {e}")
+    
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+
+def insert_model_row(conn, model_data):
+    """Store a saved model's metadata in the models table"""
+    conn.execute(
+        'INSERT OR IGNORE INTO models (id, dataset_id, name, model_type, model_path, created_at, info) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (
+            model_data['id'],
+            model_data['dataset_id'],
+            model_data.get('name'),
+            model_data.get('model_type'),
+            model_data.get('model_path') or os.path.join(app.config['MODELS_FOLDER'], f"{model_data['id']}.pkl"),
+            model_data.get('created_at', ''),
+            orjson.dumps(model_data, option=ORJSON_OPTIONS)
+        )
+    )
 
 # Initialize database on startup
-init_db()
+with app.app_context():
+    init_db()
+    import_legacy_model_files(get_db_connection())
+
+# Gunicorn --preload and Celery prefork workers fork after import; don't hand
+# them the startup connection, and make sure forked children start with an
+# empty pool
+db_pool.close_all()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=db_pool.reset)
+
+# Dataset rows by ID, so most requests skip the SQLite lookup
+dataset_cache = TTLCache(maxsize=1024, ttl=60)
+dataset_cache_lock = threading.Lock()
+
+def _get_dataset(dataset_id):
+    """
+    Get a dataset row as a dictionary, or None if it does not exist.
+    
+    Rows are remembered for the rest of the app context. Processed rows are
+    also cached across requests for a minute; call _invalidate_dataset after
+    updating one. Unprocessed rows are always read from SQLite, since another
+    worker process may process the dataset and this process's cache would
+    not see it. Each caller gets its own copy, so it may be modified freely.
+    """
+    context_rows = g.setdefault('dataset_rows', {})
+    dataset = context_rows.get(dataset_id)
+    if dataset is None:
+        with dataset_cache_lock:
+            dataset = dataset_cache.get(dataset_id)
+        if dataset is None:
+            row = get_db_connection().execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+            if row is None:
+                return None
+            dataset = dict(row)
+            if dataset.get('processed'):
+                with dataset_cache_lock:
+                    dataset_cache[dataset_id] = dataset
+        context_rows[dataset_id] = dataset
+    return dict(dataset)
+
+def _invalidate_dataset(dataset_id):
+    """Drop a dataset row from the caches after it has been written"""
+    g.get('dataset_rows', {}).pop(dataset_id, None)
+    with dataset_cache_lock:
+        dataset_cache.pop(dataset_id, None)
 
-# Database of datasets (in-memory for demo)
-datasets = {}
+@lru_cache(maxsize=128)
+def _decoded_analysis(dataset_id, version):
+    """
+    Decode a dataset's stored stats and filter options once per version.
+    
+    The version column is bumped whenever the analysis is rewritten. The
+    returned dictionaries are shared between requests, so callers must not
+    modify them.
+    
+    Returns:
+        tuple: Stats and filter options dictionaries
+    """
+    dataset = _get_dataset(dataset_id)
+    return unpack_stats(dataset['stats']), unpack_stats(dataset.get('filter_options'))
+
+# Transformed datasets held in memory, bounded by their total size in bytes
+app.config['DATASET_CACHE_MB'] = int(os.environ.get('DATASET_CACHE_MB', 512))
+dataset_frames = LRUCache(
+    maxsize=app.config['DATASET_CACHE_MB'] * 1024 * 1024,
+    getsizeof=lambda df: int(df.memory_usage(index=True, deep=True).sum())
+)
+
+@cached(dataset_frames, lock=threading.Lock())
+def _cached_load(path, mtime):
+    """Load a transformed dataset once per version of its file"""
+    return load_dataset(path)
+
+def _load_dataset(path):
+    """
+    Get the transformed DataFrame for a dataset file.
+    
+    The frame is shared between requests, so callers must not modify it.
+    Keying on the file's mtime drops stale entries when a file is replaced.
+    """
+    return _cached_load(path, os.path.getmtime(path))
+
+@lru_cache(maxsize=64)
+def _filter_index(path, mtime, column):
+    """
+    Build a lookup index over the lower-cased string values of a column.
+    
+    Returns:
+        tuple: Integer code per row and a dict mapping each value to its code
+    """
+    # Factorize the raw column, then lower-case only its distinct values;
+    # values that differ just by case are merged onto one code
+    codes, uniques = pd.factorize(_cached_load(path, mtime)[column], na_sentinel=None)
+    lookup = {}
+    remap = [lookup.setdefault(str(value).lower(), len(lookup)) for value in uniques]
+    
+    # Store codes in the smallest integer type that fits, so cached indexes
+    # stay small and comparisons scan less memory
+    remap = np.array(remap, dtype=np.min_scalar_type(max(len(lookup) - 1, 0)))
+    return remap[codes], lookup
+
+@lru_cache(maxsize=128)
+def _analyze_filtered(path, mtime, filters_key):
+    """
+    Analyze the rows of a dataset matching a set of filters.
+    
+    Args:
+        path: Path to the dataset file
+        mtime: Modification time of the file, part of the cache key
+        filters_key: Sorted tuple of (column, lower-cased value) pairs
+        
+    Returns:
+        tuple: Number of matching rows and the analysis result
+    """
+    df = _cached_load(path, mtime)
+    
+    # Apply filters as a single boolean mask (case-insensitive match)
+    mask = None
+    for column, value in filters_key:
+        if column in df.columns:
+            # Compare integer codes instead of strings; unknown values match nothing
+            codes, lookup = _filter_index(path, mtime, column)
+            code = lookup.get(value)
+            if code is None:
+                return 0, analyze_data(df.iloc[:0])
+            matches = codes == code
+            mask = matches if mask is None else np.logical_and(mask, matches, out=mask)
+        elif value != '':
+            # A missing column only matches an empty filter value
+            return 0, analyze_data(df.iloc[:0])
+    
+    # Filters that exclude nothing need no filtered copy of the frame
+    if mask is None or mask.all():
+        return len(df), analyze_data(df)
+    
+    return int(mask.sum()), analyze_data(df[mask])
 
-# Database of models (in-memory for demo)
-models = {}
 
 @app.route('/')
 def index():
@@ -95,13 +449,12 @@ def index():
     # Get recent datasets for the homepage
     conn = get_db_connection()
     datasets = conn.execute('SELECT id, filename, upload_date FROM datasets ORDER BY upload_date DESC LIMIT 5').fetchall()
-    conn.close()
     
     # Convert to a list of dictionaries
     dataset_list = [dict(dataset) for dataset in datasets] if datasets else []
     
     return render_template('index.html', 
-                          current_year=datetime.now().year,
+                          current_year=CURRENT_YEAR,
                           datasets=dataset_list)
 
 
@@ -110,27 +463,36 @@ def upload_file():
     """Handle file upload form and validation"""
     if request.method == 'GET':
         # Render the upload form for GET requests
-        return render_template('upload.html', current_year=datetime.now().year)
+        return render_template('upload.html', current_year=CURRENT_YEAR)
     
     # Process the file upload for POST requests
     if 'file' not in request.files:
-        return jsonify({'success': False, 'error': 'No file part'}), 400
+        return ojsonify({'success': False, 'error': 'No file part'}), 400
     
     file = request.files['file']
     
     if file.filename == '':
-        return jsonify({'success': False, 'error': 'No selected file'}), 400
+        return ojsonify({'success': False, 'error': 'No selected file'}), 400
     
     if file and file.filename.endswith('.csv'):
         # Generate unique ID for the dataset
-        dataset_id = str(uuid.uuid4())
+        dataset_id = uuid.uuid4().hex
         
-        # Save file
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{dataset_id}.csv")
-        file.save(file_path)
+        spooled_path = getattr(file.stream, 'name', None)
+        if isinstance(spooled_path, str) and spooled_path.endswith(UPLOAD_SPOOL_SUFFIX):
+            # The upload is already on disk; check its header and move it into place
+            validation_result = validate_csv_stream_header(file.stream)
+            file.stream.close()
+            if validation_result['valid']:
+                os.replace(spooled_path, file_path)
+        else:
+            # Stream the file to disk, stopping early if the header is invalid
+            validation_result = save_csv_stream(file.stream, file_path)
         
-        # Validate and process file
-        validation_result = validate_csv(file_path)
+        # Validate the contents of the saved file and write its Parquet cache
+        if validation_result['valid']:
+            validation_result = prepare_dataset(file_path)
         
         if validation_result['valid']:
             # Store dataset info in database
@@ -140,11 +502,10 @@ def upload_file():
                 (dataset_id, file.filename, file_path, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
             )
             conn.commit()
-            conn.close()
             
             # Check if request wants JSON response (for API clients)
             if request.headers.get('Accept') == 'application/json':
-                return jsonify({
+                return ojsonify({
                     'success': True, 
                     'dataset_id': dataset_id,
                     'message': 'File uploaded successfully',
@@ -155,35 +516,31 @@ def upload_file():
             return redirect(url_for('dashboard', dataset_id=dataset_id))
         else:
             # If validation failed, return error
-            os.remove(file_path)  # Clean up the invalid file
-            return jsonify({
+            if os.path.exists(file_path):
+                os.remove(file_path)  # Clean up the invalid file
+            return ojsonify({
                 'success': False,
                 'error': f"Validation failed: {validation_result['message']}"
             }), 400
     
-    return jsonify({'success': False, 'error': 'Invalid file type'}), 400
+    return ojsonify({'success': False, 'error': 'Invalid file type'}), 400
 
 
 @app.route('/dashboard/<dataset_id>')
 def dashboard(dataset_id):
     """Render the dashboard for a specific dataset"""
     # Get dataset from database
-    conn = get_db_connection()
-    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
-    conn.close()
+    dataset = _get_dataset(dataset_id)
     
     if not dataset:
         return redirect(url_for('index'))
     
-    # Convert to dictionary
-    dataset = dict(dataset)
-    
     return render_template(
         'dashboard.html',
         dataset_id=dataset_id,
         dataset_name=dataset['filename'],
         upload_date=dataset['upload_date'],
-        current_year=datetime.now().year
+        current_year=CURRENT_YEAR
     )
 
 
@@ -191,56 +548,69 @@ def dashboard(dataset_id):
 def get_data(dataset_id):
     """API endpoint to get processed data for the dashboard"""
     # Get dataset from database
-    conn = get_db_connection()
-    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+    dataset = _get_dataset(dataset_id)
     
     if not dataset:
-        return jsonify({'success': False, 'error': 'Dataset not found'}), 404
-    
-    # Convert to dictionary
-    dataset = dict(dataset)
+        return ojsonify({'success': False, 'error': 'Dataset not found'}), 404
     
     # Process data if not already processed
     if not dataset.get('processed'):
         try:
-            # Process and analyze data
-            transformed_data = transform_data(dataset['path'])
-            analysis_result = analyze_data(transformed_data)
+            # Process and analyze data (this also writes the Parquet cache)
+            df = _load_dataset(dataset['path'])
+            analysis_result = analyze_data(df)
             
-            # Store processed data in database
+            # Store processed data in database; if another worker finished
+            # processing first, keep its row and version
+            conn = get_db_connection()
             conn.execute(
-                'UPDATE datasets SET processed = 1, stats = ?, filter_options = ? WHERE id = ?',
+                'UPDATE datasets SET processed = 1, stats = ?, filter_options = ?, parquet_path = ?, row_count = ?, column_count = ?, column_types = ?, version = version + 1 WHERE id = ? AND processed = 0',
                 (
-                    json.dumps(analysis_result['stats']),
-                    json.dumps(analysis_result.get('filter_options', {})),
+                    pack_stats(analysis_result['stats']),
+                    pack_stats(analysis_result.get('filter_options', {})),
+                    parquet_path_for(dataset['path']),
+                    len(df),
+                    len(df.columns),
+                    pack_stats({
+                        'numeric': analysis_result['numeric_cols'],
+                        'categorical': analysis_result['categorical_cols']
+                    }),
                     dataset_id
                 )
             )
             conn.commit()
+            _invalidate_dataset(dataset_id)
             
             # Update our local copy
             dataset['stats'] = analysis_result['stats']
             dataset['filter_options'] = analysis_result.get('filter_options', {})
+            dataset['row_count'] = len(df)
+            dataset['column_count'] = len(df.columns)
             
         except Exception as e:
-            conn.close()
-            return jsonify({'success': False, 'error': str(e)}), 500
+            return ojsonify({'success': False, 'error': str(e)}), 500
     else:
-        # Parse JSON strings from database
-        try:
-            dataset['stats'] = json.loads(dataset['stats'])
-            dataset['filter_options'] = json.loads(dataset.get('filter_options', '{}'))
-        except:
-            dataset['stats'] = {}
-            dataset['filter_options'] = {}
-    
-    conn.close()
+        # Decode stored analysis results
+        dataset['stats'], dataset['filter_options'] = _decoded_analysis(dataset_id, dataset['version'])
+        
+        # Datasets processed before the counts were stored need them once
+        if dataset.get('column_count') is None:
+            dataset['column_count'] = len(dataset['stats'])
+            if dataset.get('row_count') is None and os.path.exists(dataset['path']):
+                dataset['row_count'] = len(_load_dataset(dataset['path']))
+            conn = get_db_connection()
+            conn.execute(
+                'UPDATE datasets SET row_count = ?, column_count = ? WHERE id = ?',
+                (dataset.get('row_count'), dataset['column_count'], dataset_id)
+            )
+            conn.commit()
+            _invalidate_dataset(dataset_id)
     
     # Return data for dashboard
-    return jsonify({
+    return ojsonify({
         'success': True,
-        'row_count': len(transform_data(dataset['path'])) if os.path.exists(dataset['path']) else 0,
-        'column_count': len(dataset['stats']) if dataset['stats'] else 0,
+        'row_count': dataset.get('row_count') or 0,
+        'column_count': dataset.get('column_count') or 0,
         'stats': dataset['stats'],
         'filter_options': dataset['filter_options']
     })
@@ -250,41 +620,29 @@ def get_data(dataset_id):
 def get_data_preview(dataset_id):
     """API endpoint to get a data preview for the dashboard"""
     # Get dataset from database
-    conn = get_db_connection()
-    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
-    conn.close()
+    dataset = _get_dataset(dataset_id)
     
     if not dataset:
-        return jsonify({'success': False, 'error': 'Dataset not found'}), 404
-    
-    # Convert to dictionary
-    dataset = dict(dataset)
+        return ojsonify({'success': False, 'error': 'Dataset not found'}), 404
     
     try:
         # Load data but limit to first 10 rows for preview
         file_path = dataset['path']
         if not os.path.exists(file_path):
-            return jsonify({'success': False, 'error': 'Dataset file not found'}), 404
-        
-        # Get the data
-        all_data = transform_data(file_path)
+            return ojsonify({'success': False, 'error': 'Dataset file not found'}), 404
         
-        # Limit to first 10 rows for preview
-        preview_data = all_data[:10]
+        # Parse only the first 10 rows of the file for the preview
+        head = pd.read_csv(file_path, nrows=10)
         
-        if not preview_data:
-            return jsonify({'success': False, 'error': 'No data available for preview'}), 400
+        if head.empty:
+            return ojsonify({'success': False, 'error': 'No data available for preview'}), 400
         
-        # Extract columns from first row
-        columns = list(preview_data[0].keys())
+        columns = head.columns.tolist()
         
-        # Convert to rows for table display
-        rows = []
-        for item in preview_data:
-            row = [item.get(col, '') for col in columns]
-            rows.append(row)
+        # Convert to rows for table display, showing missing values as blanks
+        rows = head.astype(object).where(head.notna(), '').values.tolist()
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'preview': {
                 'columns': columns,
@@ -292,68 +650,185 @@ def get_data_preview(dataset_id):
             }
         })
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return ojsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/filter-data', methods=['POST'])
 def filter_data():
     """API endpoint to filter data based on criteria"""
-    data = request.json
+    data = request_json()
     dataset_id = data.get('id')
     filters = data.get('filters', {})
     
     # Get dataset from database
-    conn = get_db_connection()
-    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
-    conn.close()
+    dataset = _get_dataset(dataset_id)
     
     if not dataset:
-        return jsonify({'success': False, 'error': 'Dataset not found'}), 404
-    
-    # Convert to dictionary
-    dataset = dict(dataset)
+        return ojsonify({'success': False, 'error': 'Dataset not found'}), 404
     
     if not dataset.get('processed'):
-        return jsonify({'success': False, 'error': 'Dataset not processed yet'}), 400
+        return ojsonify({'success': False, 'error': 'Dataset not processed yet'}), 400
     
     try:
-        # Load the data
-        all_data = transform_data(dataset['path'])
+        # Without filters the stored analysis of the full dataset applies as-is
+        if not filters and dataset.get('row_count') is not None:
+            stats, filter_options = _decoded_analysis(dataset_id, dataset['version'])
+            return ojsonify({
+                'success': True,
+                'row_count': dataset['row_count'],
+                'column_count': dataset.get('column_count') or len(stats),
+                'stats': stats,
+                'filter_options': filter_options
+            })
         
-        # Apply filters
-        filtered_data = all_data
-        for column, value in filters.items():
-            filtered_data = [row for row in filtered_data if str(row.get(column, '')).lower() == str(value).lower()]
+        # Filters match case-insensitively, so normalize them into the cache key
+        filters_key = tuple(sorted((column, str(value).lower()) for column, value in filters.items()))
         
-        # Analyze filtered data
-        analysis_result = analyze_data(filtered_data)
+        # Analyze filtered data (repeated filter sets are served from the cache)
+        path = dataset['path']
+        row_count, analysis_result = _analyze_filtered(path, os.path.getmtime(path), filters_key)
         
-        return jsonify({
+        return ojsonify({
             'success': True,
-            'row_count': len(filtered_data),
+            'row_count': row_count,
             'column_count': len(analysis_result['stats']),
             'stats': analysis_result['stats'],
             'filter_options': analysis_result['filter_options']
         })
         
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return ojsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/train_model/<dataset_id>', methods=['POST'])
-def train_model(dataset_id):
+def train_model_endpoint(dataset_id):
     """
     Train a machine learning model on the dataset.
     
+    When a task queue is configured the fit is handed to a Celery worker,
+    otherwise to a background thread if any are configured. Either way the
+    response carries a task ID to poll via /api/task/<task_id>.
+    
     Args:
         dataset_id: The ID of the dataset to train the model on.
         
     Returns:
-        JSON response with model results or error.
+        JSON response with model results, a task ID, or an error.
+    """
+    data = request_json()
+    
+    # Validate inputs before queueing so obvious mistakes fail fast
+    if not data or not data.get('target_column'):
+        return ojsonify({"success": False, "error": "Target column is required"})
+    
+    if use_task_queue:
+        task = train_task.delay(dataset_id, data)
+        return ojsonify({
+            "success": True,
+            "task_id": task.id,
+            "status_url": url_for('get_task_status', task_id=task.id)
+        }), 202
+    
+    if training_executor is not None:
+        job_id = uuid.uuid4().hex
+        conn = get_db_connection()
+        conn.execute(
+            'INSERT INTO training_jobs (id, dataset_id, state, created_at) VALUES (?, ?, ?, ?)',
+            (job_id, dataset_id, 'PENDING', datetime.now().isoformat())
+        )
+        conn.commit()
+        training_executor.submit(run_training_job, job_id, dataset_id, data)
+        return ojsonify({
+            "success": True,
+            "task_id": job_id,
+            "status_url": url_for('get_task_status', task_id=job_id)
+        }), 202
+    
+    return ojsonify(run_training(dataset_id, data))
+
+
+def run_training_job(job_id, dataset_id, payload):
+    """Run a training request on a background thread, recording its state in training_jobs"""
+    with app.app_context():
+        conn = get_db_connection()
+        
+        def report(stage):
+            conn.execute('UPDATE training_jobs SET state = ?, stage = ? WHERE id = ?', ('PROGRESS', stage, job_id))
+            conn.commit()
+        
+        try:
+            result = run_training(dataset_id, payload, progress=report)
+            state = 'SUCCESS'
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+            state = 'FAILURE'
+        
+        conn.execute(
+            'UPDATE training_jobs SET state = ?, result = ? WHERE id = ?',
+            (state, orjson.dumps(result, option=ORJSON_OPTIONS), job_id)
+        )
+        conn.commit()
+
+
+@celery.task(bind=True, name='train_model')
+def train_task(self, dataset_id, payload):
+    """Celery task running a training request outside the web process"""
+    def report(stage):
+        self.update_state(state='PROGRESS', meta={'stage': stage})
+    
+    # Workers run outside any request, so provide the app context themselves
+    with app.app_context():
+        return run_training(dataset_id, payload, progress=report, cache_data=False)
+
+
+@app.route('/api/task/<task_id>')
+def get_task_status(task_id):
+    """API endpoint to poll the state of a background training task"""
+    job = get_db_connection().execute('SELECT state, stage, result FROM training_jobs WHERE id = ?', (task_id,)).fetchone()
+    if job is not None:
+        response = {'success': True, 'task_id': task_id, 'state': job['state']}
+        if job['state'] == 'PROGRESS':
+            response['progress'] = {'stage': job['stage']}
+        elif job['state'] == 'SUCCESS':
+            response['result'] = orjson.loads(job['result'])
+        elif job['state'] == 'FAILURE':
+            response['success'] = False
+            response['error'] = orjson.loads(job['result'])['error']
+        return ojsonify(response)
+    
+    if not use_task_queue:
+        return ojsonify({'success': False, 'error': 'Task not found'}), 404
+    
+    task = train_task.AsyncResult(task_id)
+    response = {'success': True, 'task_id': task_id, 'state': task.state}
+    
+    if task.state == 'PROGRESS':
+        response['progress'] = task.info
+    elif task.state == 'SUCCESS':
+        response['result'] = task.result
+    elif task.state == 'FAILURE':
+        response['success'] = False
+        response['error'] = str(task.info)
+    
+    return ojsonify(response)
+
+
+def run_training(dataset_id, data, progress=None, cache_data=True):
+    """
+    Train, evaluate and save a model for a training request.
+    
+    Args:
+        dataset_id: The ID of the dataset to train the model on.
+        data: Request payload with target column, model type and parameters.
+        progress: Optional callback receiving the current stage name.
+        cache_data: Whether to keep the loaded dataset in the in-process cache.
+            Workers that only train pass False, so each task frees its data.
+        
+    Returns:
+        dict: Response payload with model results or error.
     """
     try:
         # Get the request data
-        data = request.get_json()
         target_column = data.get('target_column')
         model_type = data.get('model_type', 'LinearRegression')
         params = data.get('params', {})
@@ -363,32 +838,36 @@ def train_model(dataset_id):
         
         # Validate inputs
         if not target_column:
-            return jsonify({"success": False, "error": "Target column is required"})
+            return {"success": False, "error": "Target column is required"}
+        
+        if progress:
+            progress('loading')
         
         # Get the dataset
-        conn = get_db_connection()
-        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
-        conn.close()
+        dataset = _get_dataset(dataset_id)
         
         if not dataset:
-            return jsonify({"success": False, "error": "Dataset not found"})
-        
-        # Convert to dictionary
-        dataset = dict(dataset)
+            return {"success": False, "error": "Dataset not found"}
         
         # Load the actual data from the file
         if not os.path.exists(dataset['path']):
-            return jsonify({"success": False, "error": "Dataset file not found"})
+            return {"success": False, "error": "Dataset file not found"}
         
-        # Load data using pandas
+        # Load the cleaned data (served from the Parquet cache after the first parse)
         try:
-            df = pd.read_csv(dataset['path'])
+            df = _load_dataset(dataset['path']) if cache_data else load_dataset(dataset['path'])
         except Exception as e:
-            return jsonify({"success": False, "error": f"Error reading dataset: {str(e)}"})
+            return {"success": False, "error": f"Error reading dataset: {str(e)}"}
         
         # Check if target column exists in the dataset
         if target_column not in df.columns:
-            return jsonify({"success": False, "error": f"Target column '{target_column}' not found in dataset"})
+            return {"success": False, "error": f"Target column '{target_column}' not found in dataset"}
+        
+        # Bound training time on very large datasets by fitting on a sample
+        total_rows = len(df)
+        max_train_rows = app.config['MAX_TRAIN_ROWS']
+        if total_rows > max_train_rows:
+            df = df.sample(n=max_train_rows, random_state=42)
         
         # Check if target column is categorical and convert if needed
         target = df[target_column]
@@ -398,24 +877,41 @@ def train_model(dataset_id):
         # Check if target column has string values
         if target.dtype == 'object' or pd.api.types.is_categorical_dtype(target):
             is_categorical_target = True
-            # Create a mapping from categorical values to numbers
-            unique_values = target.unique()
-            target_mapping = {val: idx for idx, val in enumerate(unique_values)}
-            # Convert target to numeric values
-            target = target.map(target_mapping)
+            # Encode the values as integer codes in one pass; the categories
+            # give both the mapping and the reverse mapping
+            target_categories = pd.Categorical(target)
+            categories = target_categories.categories
+            codes = target_categories.codes
             
-            # Check if conversion succeeded
-            if target.isna().any():
-                return jsonify({
+            # Missing values get code -1
+            if len(codes) and codes.min() < 0:
+                return {
                     "success": False, 
                     "error": f"Could not convert all values in target column '{target_column}' to numeric"
-                })
+                }
+            
+            target_mapping = dict(zip(categories.tolist(), range(len(categories))))
+            # Convert target to numeric values
+            target = pd.Series(codes, index=target.index)
         
         # Extract features
         features = df.drop(columns=[target_column])
         
-        # Handle categorical features in the feature set
-        features = pd.get_dummies(features)
+        # One-hot encode categorical features; numeric features pass through.
+        # The result stays sparse when the one-hot columns make it mostly zeros,
+        # unless the model only accepts dense input
+        categorical_features = features.select_dtypes(include=['object', 'category']).columns.tolist()
+        numeric_features = [col for col in features.columns if col not in categorical_features]
+        preprocessor = ColumnTransformer(
+            [
+                ('num', 'passthrough', numeric_features),
+                ('cat', OneHotEncoder(handle_unknown='ignore', sparse=True), categorical_features)
+            ],
+            sparse_threshold=0 if model_type in DENSE_INPUT_MODELS else 0.3,
+            verbose_feature_names_out=False
+        )
+        features = preprocessor.fit_transform(features)
+        feature_names = preprocessor.get_feature_names_out()
         
         # Split the data
         X_train, X_test, y_train, y_test = train_test_split(
@@ -425,13 +921,18 @@ def train_model(dataset_id):
         # Initialize the model based on type
         model = initialize_model(model_type, params)
         
+        if progress:
+            progress('training')
+        
         # Train the model
         if use_cross_validation:
-            # Import cross_val_score if needed
-            from sklearn.model_selection import cross_val_score
-            # Perform cross-validation
-            cv_scores = cross_val_score(model, features, target, cv=5)
-            model.fit(X_train, y_train)
+            # Cross-validate on the training split and keep the best fold's
+            # model rather than fitting a sixth time
+            cv_results = cross_validate(
+                model, X_train, y_train, cv=5, return_estimator=True, n_jobs=app.config['TRAIN_N_JOBS']
+            )
+            cv_scores = cv_results['test_score']
+            model = cv_results['estimator'][int(np.argmax(cv_scores))]
         else:
             # Standard training
             model.fit(X_train, y_train)
@@ -443,24 +944,38 @@ def train_model(dataset_id):
         metrics = calculate_metrics(y_test, y_pred)
         
         # Get feature importance if applicable
-        feature_importance = {}
+        importance_values = None
         if hasattr(model, 'feature_importances_'):
             # For tree-based models
-            feature_importance = dict(zip(features.columns, model.feature_importances_))
+            importance_values = model.feature_importances_
         elif hasattr(model, 'coef_'):
-            # For linear models
-            if len(model.coef_.shape) == 1:
-                # Regression
-                importance_values = abs(model.coef_)
-                # Normalize to sum to 1
-                importance_values = importance_values / importance_values.sum()
-                feature_importance = dict(zip(features.columns, importance_values))
-            else:
-                # Classification
-                importance_values = np.mean(abs(model.coef_), axis=0)
-                # Normalize to sum to 1
-                importance_values = importance_values / importance_values.sum()
-                feature_importance = dict(zip(features.columns, importance_values))
+            # For linear models, use absolute coefficients (averaged over outputs)
+            coef = model.coef_.toarray() if hasattr(model.coef_, 'toarray') else model.coef_
+            importance_values = np.abs(coef)
+            if importance_values.ndim > 1:
+                importance_values = importance_values.mean(axis=0)
+            # Normalize to sum to 1
+            total = importance_values.sum()
+            if total:
+                importance_values /= total
+        elif model_type in DENSE_INPUT_MODELS:
+            # Histogram gradient boosting has no built-in importances; measure
+            # the drop in test score when each feature is shuffled
+            permuted = permutation_importance(
+                model, X_test, y_test, n_repeats=PERMUTATION_REPEATS,
+                max_samples=min(PERMUTATION_MAX_SAMPLES, X_test.shape[0]),
+                random_state=42, n_jobs=app.config['TRAIN_N_JOBS']
+            )
+            importance_values = np.clip(permuted.importances_mean, 0, None)
+            total = importance_values.sum()
+            if total:
+                importance_values /= total
+        
+        # Report only the most important features to keep the response small
+        feature_importance = {}
+        if importance_values is not None:
+            top = np.argsort(-importance_values, kind='stable')[:MAX_FEATURE_IMPORTANCES]
+            feature_importance = dict(zip(feature_names[top].tolist(), importance_values[top].tolist()))
         
         # Add cross-validation results if applicable
         if use_cross_validation:
@@ -468,19 +983,18 @@ def train_model(dataset_id):
             metrics['cv_std_score'] = cv_scores.std()
         
         # Prepare sample of predictions for visualization
-        sample_indices = np.random.choice(len(y_test), min(50, len(y_test)), replace=False)
+        # Without shuffle=False, choice permutes the whole test set to draw 50
+        sample_indices = sample_rng.choice(len(y_test), size=min(50, len(y_test)), replace=False, shuffle=False)
         
         # If target was categorical, map predictions back to original categories for display
         if is_categorical_target:
-            # Reverse the mapping for display
-            reverse_mapping = {idx: val for val, idx in target_mapping.items()}
-            
-            # For actual values, map from numeric back to original categories
-            actual_values = [reverse_mapping.get(val, val) for val in y_test.iloc[sample_indices].tolist()]
+            # For actual values, map from codes back to original categories
+            actual_values = categories.take(y_test.iloc[sample_indices]).tolist()
             
             # For predictions, we need to round to nearest integer first (for regression models)
-            # then map back to original categories
-            pred_values = [reverse_mapping.get(round(val), val) for val in y_pred[sample_indices].tolist()]
+            # then map back to original categories, clamping to the valid code range
+            pred_codes = np.clip(np.rint(y_pred[sample_indices]).astype(np.intp), 0, len(categories) - 1)
+            pred_values = categories.take(pred_codes).tolist()
             
             predictions = {
                 'actual': actual_values,
@@ -494,15 +1008,20 @@ def train_model(dataset_id):
                 'predicted': y_pred[sample_indices].tolist()
             }
         
+        if progress:
+            progress('saving')
+        
         # Save the trained model
         model_info = {
             'is_categorical_target': is_categorical_target,
             'target_mapping': target_mapping if is_categorical_target else {}
         }
-        model_id = save_model(dataset_id, model, target_column, model_type, metrics, model_name, model_info)
+        # Save the encoder with the model so raw rows can be passed to predict
+        pipeline = Pipeline([('preprocess', preprocessor), ('model', model)])
+        model_id = save_model(dataset_id, pipeline, target_column, model_type, metrics, model_name, model_info)
         
         # Return the results
-        return jsonify({
+        return {
             "success": True,
             "model_id": model_id,
             "model_name": model_name,
@@ -512,13 +1031,15 @@ def train_model(dataset_id):
             "metrics": metrics,
             "feature_importance": feature_importance,
             "predictions": predictions,
+            "training_rows": len(df),
+            "total_rows": total_rows,
             "is_categorical_target": is_categorical_target,
             "target_mapping": target_mapping if is_categorical_target else {}
-        })
+        }
     
     except Exception as e:
         app.logger.error(f"Error training model: {str(e)}")
-        return jsonify({"success": False, "error": f"Error training model: {str(e)}"})
+        return {"success": False, "error": f"Error training model: {str(e)}"}
 
 def initialize_model(model_type, params):
     """
@@ -542,14 +1063,16 @@ def initialize_model(model_type, params):
             max_depth=params.get('max_depth', None),
             min_samples_split=params.get('min_samples_split', 2),
             min_samples_leaf=params.get('min_samples_leaf', 1),
+            n_jobs=app.config['TRAIN_N_JOBS'],
             random_state=42
         )
     elif model_type == 'GradientBoosting':
-        return GradientBoostingRegressor(
-            n_estimators=params.get('n_estimators', 100),
+        # Histogram-based boosting bins each feature once, which is far faster
+        # than exact splits; it has no row subsampling option
+        return HistGradientBoostingRegressor(
+            max_iter=params.get('n_estimators', 100),
             learning_rate=params.get('learning_rate', 0.1),
             max_depth=params.get('max_depth', 3),
-            subsample=params.get('subsample', 1.0),
             random_state=42
         )
     elif model_type == 'SVM':
@@ -572,11 +1095,27 @@ def calculate_metrics(y_true, y_pred):
     Returns:
         Dict of metrics
     """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    
+    # Compute the residuals once and derive every metric from them
+    errors = y_true - y_pred
+    ss_res = float(np.dot(errors, errors))
+    centered = y_true - y_true.mean()
+    ss_tot = float(np.dot(centered, centered))
+    mse = ss_res / len(errors)
+    
+    # Same convention as sklearn's r2_score for a constant target
+    if ss_tot:
+        r2 = 1.0 - ss_res / ss_tot
+    else:
+        r2 = 1.0 if ss_res == 0 else 0.0
+    
     metrics = {
-        'r2_score': r2_score(y_true, y_pred),
-        'mean_absolute_error': mean_absolute_error(y_true, y_pred),
-        'mean_squared_error': mean_squared_error(y_true, y_pred),
-        'root_mean_squared_error': np.sqrt(mean_squared_error(y_true, y_pred))
+        'r2_score': r2,
+        'mean_absolute_error': float(np.abs(errors).mean()),
+        'mean_squared_error': mse,
+        'root_mean_squared_error': mse ** 0.5
     }
     return metrics
 
@@ -598,12 +1137,12 @@ def save_model(dataset_id, model, target_column, model_type, metrics, model_name
     os.makedirs(models_dir, exist_ok=True)
     
     # Generate a unique model ID
-    model_id = str(uuid.uuid4())
+    model_id = uuid.uuid4().hex
     
-    # Save the model with pickle
-    model_path = os.path.join(models_dir, f'{model_id}.pkl')
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
+    # Save the model with joblib; LZ4 shrinks tree ensembles several times over
+    # at little CPU cost. Load it back with joblib.load(model_path)
+    model_path = os.path.join(models_dir, f'{model_id}.joblib')
+    joblib.dump(model, model_path, compress=('lz4', 3), protocol=pickle.HIGHEST_PROTOCOL)
     
     # Current timestamp for created_at
     now = datetime.now().isoformat()
@@ -624,112 +1163,150 @@ def save_model(dataset_id, model, target_column, model_type, metrics, model_name
     if model_info:
         model_data.update(model_info)
     
-    # Save model info to JSON file
-    info_path = os.path.join(models_dir, f'{model_id}_info.json')
-    with open(info_path, 'w') as f:
-        json.dump(model_data, f, indent=2)
-    
-    # Add to in-memory models database
-    models[model_id] = model_data
+    # Save model info to the database
+    conn = get_db_connection()
+    insert_model_row(conn, model_data)
+    conn.commit()
     
     return model_id
 
+@lru_cache(maxsize=256)
+def _insights_html(dataset_id, version, row_count, prompt):
+    """
+    Build the insights HTML for a prompt about one version of a dataset.
+    
+    Args:
+        dataset_id: ID of the dataset
+        version: Analysis version of the dataset, part of the cache key
+        row_count: Number of rows in the dataset
+        prompt: The user's question
+        
+    Returns:
+        str: HTML fragment describing the dataset
+    """
+    # Generate a simple insight (in a real app, this would use LLM or other AI)
+    # Here we're just returning a template response
+    dataset = _get_dataset(dataset_id)
+    stats, _ = _decoded_analysis(dataset_id, version)
+    
+    columns = list(stats.keys())
+    
+    # Create a simple insight, collecting HTML fragments to join once at the end
+    parts = []
+    parts.append(f"""
+    <h3>Analysis of "{prompt}"</h3>
+    <p>Your dataset contains {row_count} rows and {len(columns)} columns. 
+    The main columns are: {', '.join(columns[:5])}.</p>
+    
+    <p>Based on your question, here are some key observations:</p>
+    <ul>
+    """)
+    
+    # Add some sample insights
+    column_types = unpack_stats(dataset.get('column_types'))
+    numeric_columns = column_types.get('numeric')
+    categorical_columns = column_types.get('categorical')
+    
+    # Datasets processed before column types were stored
+    if numeric_columns is None or categorical_columns is None:
+        numeric_columns = [col for col, info in stats.items() if info.get('type') == 'numeric']
+        categorical_columns = [col for col, info in stats.items() if info.get('type') == 'categorical']
+    
+    if numeric_columns:
+        for col in numeric_columns[:2]:
+            col_stats = stats[col]
+            parts.append(f"<li>The average {col} is {col_stats.get('mean', 0):.2f}, ranging from {col_stats.get('min', 0):.2f} to {col_stats.get('max', 0):.2f}.</li>")
+    
+    if categorical_columns:
+        for col in categorical_columns[:2]:
+            col_stats = stats[col]
+            value_counts = col_stats.get('value_counts', {})
+            top_category = col_stats.get('top_value')
+            total = col_stats.get('count')
+            # Stats stored before the mode and total were precomputed
+            if top_category is None or total is None:
+                top_category = max(value_counts.items(), key=lambda x: x[1])[0]
+                total = sum(value_counts.values())
+            percentage = value_counts.get(top_category, 0) / total * 100 if total else 0
+            parts.append(f"<li>The most common {col} is '{top_category}' ({percentage:.1f}% of all records).</li>")
+    
+    parts.append("</ul>")
+    
+    # Add a simple recommendation
+    parts.append("""
+    <h4>Recommendations</h4>
+    <p>Based on this analysis, you might want to:</p>
+    <ol>
+        <li>Explore the correlation between numeric variables to find relationships</li>
+        <li>Check for outliers in the data that might be skewing results</li>
+        <li>Consider creating visualizations to better understand patterns</li>
+    </ol>
+    """)
+    
+    return "".join(parts)
+
 @app.route('/api/insights', methods=['POST'])
 def generate_insights():
     """API endpoint to generate insights about the data"""
-    data = request.json
+    data = request_json()
     dataset_id = data.get('dataset_id')
     prompt = data.get('prompt')
     
     if not dataset_id or not prompt:
-        return jsonify({'success': False, 'error': 'Missing dataset ID or prompt'}), 400
+        return ojsonify({'success': False, 'error': 'Missing dataset ID or prompt'}), 400
     
     # Get dataset from database
-    conn = get_db_connection()
-    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
-    conn.close()
+    dataset = _get_dataset(dataset_id)
     
     if not dataset:
-        return jsonify({'success': False, 'error': 'Dataset not found'}), 404
-    
-    # Convert to dictionary
-    dataset = dict(dataset)
+        return ojsonify({'success': False, 'error': 'Dataset not found'}), 404
     
     try:
-        # Load the data
-        all_data = transform_data(dataset['path'])
-        
-        # Generate a simple insight (in a real app, this would use LLM or other AI)
-        # Here we're just returning a template response
-        stats = json.loads(dataset['stats']) if isinstance(dataset['stats'], str) else dataset['stats']
-        
-        columns = list(stats.keys())
-        row_count = len(all_data)
-        
-        # Create a simple insight
-        insight = f"""
-        <h3>Analysis of "{prompt}"</h3>
-        <p>Your dataset contains {row_count} rows and {len(columns)} columns. 
-        The main columns are: {', '.join(columns[:5])}.</p>
-        
-        <p>Based on your question, here are some key observations:</p>
-        <ul>
-        """
+        # Only load the data when the stored row count is missing
+        row_count = dataset.get('row_count')
+        if row_count is None:
+            row_count = len(_load_dataset(dataset['path']))
         
-        # Add some sample insights
-        numeric_columns = [col for col, info in stats.items() if info.get('type') == 'numeric']
-        categorical_columns = [col for col, info in stats.items() if info.get('type') == 'categorical']
-        
-        if numeric_columns:
-            for col in numeric_columns[:2]:
-                col_stats = stats[col]
-                insight += f"<li>The average {col} is {col_stats.get('mean', 0):.2f}, ranging from {col_stats.get('min', 0):.2f} to {col_stats.get('max', 0):.2f}.</li>"
-        
-        if categorical_columns:
-            for col in categorical_columns[:2]:
-                col_stats = stats[col]
-                top_category = max(col_stats.get('value_counts', {}).items(), key=lambda x: x[1])[0]
-                total = sum(col_stats.get('value_counts', {}).values())
-                percentage = col_stats.get('value_counts', {}).get(top_category, 0) / total * 100 if total else 0
-                insight += f"<li>The most common {col} is '{top_category}' ({percentage:.1f}% of all records).</li>"
-        
-        insight += "</ul>"
-        
-        # Add a simple recommendation
-        insight += """
-        <h4>Recommendations</h4>
-        <p>Based on this analysis, you might want to:</p>
-        <ol>
-            <li>Explore the correlation between numeric variables to find relationships</li>
-            <li>Check for outliers in the data that might be skewing results</li>
-            <li>Consider creating visualizations to better understand patterns</li>
-        </ol>
-        """
-        
-        return jsonify({
+        # Repeated prompts against the same version of a dataset are served from the cache
+        return ojsonify({
             'success': True,
-            'insights': insight
+            'insights': _insights_html(dataset_id, dataset['version'], row_count, prompt)
         })
         
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return ojsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/db/pool-health')
+def db_pool_health():
+    """API endpoint reporting database connection pool usage"""
+    return ojsonify({'success': True, **db_pool.health()})
 
 
 # Serve static files if needed
 @app.route('/static/<path:path>')
 def serve_static(path):
     """Serve static files"""
-    return send_from_directory('static', path)
+    return send_from_directory('static', path, conditional=True, max_age=STATIC_MAX_AGE)
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """Version static URLs by file mtime so a changed asset gets a new URL"""
+    if endpoint == 'static' and 'filename' in values:
+        try:
+            values['v'] = int(os.stat(os.path.join(app.static_folder, values['filename'])).st_mtime)
+        except OSError:
+            pass
 
 @app.route('/api/saved_models/<dataset_id>')
 def get_saved_models(dataset_id):
-    # Get all models for this dataset
-    dataset_models = [model for model_id, model in models.items() if model['dataset_id'] == dataset_id]
+    # Get all models for this dataset, newest first
+    rows = get_db_connection().execute(
+        'SELECT info FROM models WHERE dataset_id = ? ORDER BY created_at DESC', (dataset_id,)
+    ).fetchall()
+    dataset_models = [orjson.loads(row['info']) for row in rows]
     
-    # Sort by creation date, newest first
-    dataset_models.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    
-    return jsonify({
+    return ojsonify({
         'success': True,
         'models': dataset_models
     })
@@ -737,23 +1314,26 @@ def get_saved_models(dataset_id):
 @app.route('/api/model/<model_id>')
 def get_model(model_id):
     # Check if model exists
-    if model_id not in models:
-        return jsonify({
+    row = get_db_connection().execute('SELECT info FROM models WHERE id = ?', (model_id,)).fetchone()
+    if row is None:
+        return ojsonify({
             'success': False,
             'error': 'Model not found'
         })
     
     # Return model info
-    return jsonify({
+    return ojsonify({
         'success': True,
-        **models[model_id]
+        **orjson.loads(row['info'])
     })
 
 @app.route('/api/model/<model_id>', methods=['DELETE'])
 def delete_model(model_id):
     # Check if model exists
-    if model_id not in models:
-        return jsonify({
+    conn = get_db_connection()
+    row = conn.execute('SELECT model_path FROM models WHERE id = ?', (model_id,)).fetchone()
+    if row is None:
+        return ojsonify({
             'success': False,
             'error': 'Model not found'
         })
@@ -762,45 +1342,29 @@ def delete_model(model_id):
         models_dir = app.config['MODELS_FOLDER']
         
         # Delete model file
-        model_path = os.path.join(models_dir, f'{model_id}.pkl')
+        model_path = row['model_path']
         if os.path.exists(model_path):
             os.remove(model_path)
         
-        # Delete model info file
+        # Delete the info file of a model saved before the models table existed
         model_info_path = os.path.join(models_dir, f'{model_id}_info.json')
         if os.path.exists(model_info_path):
             os.remove(model_info_path)
         
-        # Remove from in-memory database
-        models.pop(model_id)
+        # Remove from the database
+        conn.execute('DELETE FROM models WHERE id = ?', (model_id,))
+        conn.commit()
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'message': 'Model deleted successfully'
         })
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'error': f'Error deleting model: {str(e)}'
         })
 
-# Load saved models on startup
-def load_saved_models():
-    models_dir = app.config['MODELS_FOLDER']
-    if os.path.exists(models_dir):
-        for filename in os.listdir(models_dir):
-            if filename.endswith('_info.json'):
-                try:
-                    model_id = filename.replace('_info.json', '')
-                    with open(os.path.join(models_dir, filename), 'r') as f:
-                        model_info = json.load(f)
-                        models[model_id] = model_info
-                except Exception as e:
-                    print(f"Error loading model {filename}: {e}")
-
-# Call on startup
-load_saved_models()
-
 # Start the app
 if __name__ == '__main__':
     # Use environment variable for port with a default of 5000
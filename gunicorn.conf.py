@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration for running the dashboard outside Vercel.
+
+Requests spend most of their time on file, SQLite and network I/O, so each
+worker process runs several threads to keep serving while others wait.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# One process per core (capped), each with a pool of request threads
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# GUNICORN_WORKER_CLASS=gevent serves many more concurrent requests per
+# process on greenlets; it needs gevent installed and a Celery broker, since
+# training on in-process threads would block every greenlet in the worker
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 500))
+
+# Training normally runs on the TRAIN_WORKERS thread pool or Celery, but with
+# TRAIN_WORKERS=0 it runs inside the request; allow such a request two minutes
+# before the worker is restarted. Large uploads and first-time analysis of a
+# dataset also run inside the request
+timeout = 120
+keepalive = 5
@@ -1020,6 +1020,7 @@ function trainModel(datasetId) {
         })
     })
     .then(response => response.json())
+    .then(data => data.task_id ? pollTrainingTask(data.task_id) : data)
     .then(data => {
         hideLoading();
         if (data.success) {
@@ -1044,6 +1045,27 @@ function trainModel(datasetId) {
     });
 }
 
+// Poll a background training task until it finishes
+function pollTrainingTask(taskId, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        const check = () => {
+            fetch(`/api/task/${taskId}`)
+                .then(response => response.json())
+                .then(status => {
+                    if (status.state === 'SUCCESS') {
+                        resolve(status.result);
+                    } else if (!status.success) {
+                        resolve({ success: false, error: status.error || 'Training task failed' });
+                    } else {
+                        setTimeout(check, interval);
+                    }
+                })
+                .catch(reject);
+        };
+        check();
+    });
+}
+
 // Collect model parameters from the form based on model type
 function collectModelParameters(modelType) {
     let params = {};
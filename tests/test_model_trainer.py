@@ -0,0 +1,27 @@
+"""Tests for utils.model_trainer."""
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from utils.model_trainer import train_model, evaluate_model
+
+
+def test_category_only_in_test_split_is_ignored():
+    n = 50
+    df = pd.DataFrame({
+        'size': np.arange(n, dtype=float),
+        'color': ['red', 'blue'] * (n // 2),
+        'price': np.arange(n, dtype=float) * 2.0
+    })
+    
+    # Rows train_model will put in its test split (same size and seed)
+    _, test_rows = train_test_split(np.arange(n), test_size=0.2, random_state=42)
+    df.loc[test_rows[0], 'color'] = 'green'
+    
+    result = train_model(df, 'price', model_type='regressor')
+    assert 'green' not in set(result['X_train']['color'])
+    assert 'green' in set(result['X_test']['color'])
+    
+    evaluation = evaluate_model(result['model'], result['X_test'], result['y_test'])
+    assert np.isfinite(evaluation['metrics']['r2'])
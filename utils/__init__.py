@@ -4,13 +4,16 @@ Utils Package
 This package contains utility modules for the dashboard application.
 """
 
-from utils.data_processor import validate_csv, transform_data, analyze_data
+from utils.data_processor import validate_csv, prepare_dataset, load_dataset, transform_data, transform_data_records, analyze_data
 from utils.model_trainer import train_model, evaluate_model
 from utils.ai_insights import generate_insights
 
 __all__ = [
     'validate_csv',
+    'prepare_dataset',
+    'load_dataset',
     'transform_data',
+    'transform_data_records',
     'analyze_data',
     'train_model',
     'evaluate_model',
@@ -0,0 +1,133 @@
+"""
+Numeric Kernels Module
+
+This module holds the array routines behind the analysis and insight
+helpers, written to make as few passes over the data as possible.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def top_value_counts(values, n):
+    """
+    Count the distinct values of a column and pick the n most frequent.
+    
+    Gives the same counts as Series.value_counts, but hashes the values once
+    and only sorts the n selected counts rather than all of them.
+    
+    Args:
+        values: Series or array of values; missing values are not counted
+        n: Number of most frequent values to return
+        
+    Returns:
+        tuple: The top values and their counts, most frequent first, and the
+            array of counts of every distinct value
+    """
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    
+    if n < len(counts):
+        top = np.argpartition(-counts, n - 1)[:n]
+    else:
+        top = np.arange(len(counts))
+    top = top[np.argsort(-counts[top], kind='stable')]
+    
+    return uniques[top], counts[top], counts
+
+
+def correlation_matrix(arr):
+    """
+    Compute the Pearson correlation matrix of the columns of an array.
+    
+    Without missing values this is a single matrix product of the
+    standardized columns; otherwise pandas' pairwise computation is used.
+    Columns with no variation correlate 0 with everything (pandas gives NaN).
+    
+    Args:
+        arr: 2D float array with one column per variable
+        
+    Returns:
+        ndarray: Square matrix of correlation coefficients
+    """
+    if np.isnan(arr).any():
+        return pd.DataFrame(arr).corr().to_numpy()
+    
+    std = arr.std(axis=0)
+    std[std == 0] = 1
+    z = (arr - arr.mean(axis=0)) / std
+    return (z.T @ z) / arr.shape[0]
+
+
+def zscore_outliers(arr, thresh=3.0, max_examples=5):
+    """
+    Find values more than thresh standard deviations from their column mean.
+    
+    Missing values are ignored. Columns with no spread (constant or all
+    missing) have no outliers.
+    
+    Args:
+        arr: 2D float array with one column per variable
+        thresh: Absolute z-score above which a value is an outlier
+        max_examples: Number of outlier row indices to record per column
+        
+    Returns:
+        tuple: Outlier count per column, and a (columns, max_examples) array
+            of the first outlier row indices per column, padded with -1
+    """
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # All-missing columns give NaN statistics
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(arr, axis=0)
+        std = np.nanstd(arr, axis=0)
+        # An infinite spread flags nothing
+        std = np.where(std > 0, std, np.inf)
+        
+        # Reuse one temporary for the deviations and z-scores
+        z = np.subtract(arr, mean)
+        np.abs(z, out=z)
+        np.divide(z, std, out=z)
+        mask = z > thresh
+    
+    counts = mask.sum(axis=0)
+    
+    examples = np.full((arr.shape[1], max_examples), -1, dtype=np.intp)
+    for j in np.flatnonzero(counts):
+        rows = np.flatnonzero(mask[:, j])[:max_examples]
+        examples[j, :len(rows)] = rows
+    
+    return counts, examples
+
+
+def linear_trends(y):
+    """
+    Fit a least-squares line over evenly spaced steps to each column.
+    
+    Equivalent to scipy.stats.linregress(np.arange(len(y)), y[:, j]) for
+    every column j, with the shared x terms computed once. Columns with
+    missing values or no variation get NaN results.
+    
+    Args:
+        y: 2D float array with one row per step and one column per series
+        
+    Returns:
+        tuple: Slope, correlation coefficient and two-sided p-value arrays
+    """
+    n = y.shape[0]
+    x = np.arange(n, dtype=np.float64)
+    x -= x.mean()
+    ss_x = x @ x
+    
+    deviations = y - y.mean(axis=0)
+    cross = x @ deviations
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = cross / ss_x
+        r = np.clip(cross / np.sqrt(ss_x * np.einsum('ij,ij->j', deviations, deviations)), -1.0, 1.0)
+        t = r * np.sqrt((n - 2) / ((1.0 - r) * (1.0 + r)))
+    
+    p_value = 2 * stats.t.sf(np.abs(t), n - 2)
+    return slope, r, p_value
@@ -5,10 +5,17 @@ This module generates AI-powered insights from data
 using various analysis techniques.
 """
 
+import re
+
 import pandas as pd
 import numpy as np
-from scipy import stats
-import json
+
+from utils._numeric_kernels import top_value_counts, correlation_matrix, zscore_outliers, linear_trends
+
+# Prompt keywords asking for distribution and comparison insights; "vs" must
+# be a whole word so it doesn't match inside words like "canvas"
+_DISTRIBUTION_RE = re.compile(r'distribution|histogram|frequency', re.IGNORECASE)
+_COMPARISON_RE = re.compile(r'compar(?:e|ison)|versus|\bvs\b', re.IGNORECASE)
 
 
 def generate_insights(data, filters=None, prompt=None):
@@ -16,21 +23,26 @@ def generate_insights(data, filters=None, prompt=None):
     Generate insights from the provided data.
     
     Args:
-        data: List of dictionaries containing the data
+        data: DataFrame or list of dictionaries containing the data
         filters: Dictionary of filters to apply
         prompt: Optional prompt to guide insight generation
         
     Returns:
         dict: Dictionary containing insights
     """
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    # Convert to DataFrame if needed
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
     
-    # Apply filters if provided
+    # Apply filters if provided, combining them into one mask so the rows
+    # are copied once
     if filters:
+        mask = None
         for column, values in filters.items():
             if column in df.columns:
-                df = df[df[column].isin(values)]
+                matches = _isin(df[column], values)
+                mask = matches if mask is None else np.logical_and(mask, matches, out=mask)
+        if mask is not None:
+            df = df[mask]
     
     # Check if we have enough data
     if len(df) < 5:
@@ -39,11 +51,16 @@ def generate_insights(data, filters=None, prompt=None):
             "message": "Not enough data to generate insights. Please select different filters."
         }
     
+    # Find column types once for all the helpers
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    numeric_set = set(numeric_cols)
+    categorical_cols = [col for col in df.columns if col not in numeric_set]
+    
     # Generate insights based on data
     insights = []
     
     # 1. Basic statistics
-    basic_stats = _generate_basic_stats(df)
+    basic_stats = _generate_basic_stats(df, numeric_cols, categorical_cols)
     insights.append({
         "title": "Data Overview",
         "type": "summary",
@@ -51,7 +68,7 @@ def generate_insights(data, filters=None, prompt=None):
     })
     
     # 2. Correlations
-    correlation_insights = _generate_correlation_insights(df)
+    correlation_insights = _generate_correlation_insights(df, numeric_cols)
     if correlation_insights:
         insights.append({
             "title": "Correlations",
@@ -60,7 +77,7 @@ def generate_insights(data, filters=None, prompt=None):
         })
     
     # 3. Outliers
-    outlier_insights = _generate_outlier_insights(df)
+    outlier_insights = _generate_outlier_insights(df, numeric_cols)
     if outlier_insights:
         insights.append({
             "title": "Outliers",
@@ -69,7 +86,7 @@ def generate_insights(data, filters=None, prompt=None):
         })
     
     # 4. Trends
-    trend_insights = _generate_trend_insights(df)
+    trend_insights = _generate_trend_insights(df, numeric_cols)
     if trend_insights:
         insights.append({
             "title": "Trends",
@@ -79,7 +96,7 @@ def generate_insights(data, filters=None, prompt=None):
     
     # 5. Custom prompt-based insights
     if prompt:
-        custom_insights = _generate_custom_insights(df, prompt)
+        custom_insights = _generate_custom_insights(df, prompt, numeric_cols, categorical_cols)
         if custom_insights:
             insights.append({
                 "title": "Custom Analysis",
@@ -93,12 +110,25 @@ def generate_insights(data, filters=None, prompt=None):
     }
 
 
-def _generate_basic_stats(df):
-    """Generate basic statistics about the dataset."""
-    # Get column types
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
+def _isin(column, values):
+    """
+    Check which values of a column are in a list, as a boolean array.
     
+    Categorical columns compare their integer codes instead of the values.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        wanted = pd.Index(values)
+        codes = column.cat.categories.get_indexer(wanted)
+        codes = codes[codes >= 0]
+        # Missing values have code -1
+        if wanted.hasnans:
+            codes = np.append(codes, -1)
+        return np.isin(column.cat.codes.to_numpy(), codes)
+    return column.isin(values).to_numpy()
+
+
+def _generate_basic_stats(df, numeric_cols, categorical_cols):
+    """Generate basic statistics about the dataset."""
     stats = {
         "row_count": len(df),
         "column_count": len(df.columns),
@@ -108,25 +138,20 @@ def _generate_basic_stats(df):
     
     # Add summary for numeric columns
     if numeric_cols:
-        numeric_summary = {}
-        for col in numeric_cols[:5]:  # Limit to first 5 columns
-            numeric_summary[col] = {
-                "mean": round(float(df[col].mean()), 2),
-                "median": round(float(df[col].median()), 2),
-                "min": round(float(df[col].min()), 2),
-                "max": round(float(df[col].max()), 2)
-            }
-        stats["numeric_summary"] = numeric_summary
+        # Limit to first 5 columns, aggregating and rounding them together
+        summary = df[numeric_cols[:5]].agg(['mean', 'median', 'min', 'max']).astype(np.float64).round(2)
+        stats["numeric_summary"] = summary.to_dict()
     
     # Add summary for categorical columns
     if categorical_cols:
         categorical_summary = {}
         for col in categorical_cols[:5]:  # Limit to first 5 columns
-            value_counts = df[col].value_counts().head(3).to_dict()
+            top_values, top_counts, counts = top_value_counts(df[col], 3)
             # Convert keys to strings for JSON serialization
-            value_counts = {str(k): int(v) for k, v in value_counts.items()}
+            value_counts = {str(k): v for k, v in zip(top_values.tolist(), top_counts.tolist())}
             categorical_summary[col] = {
-                "unique_values": len(df[col].unique()),
+                # Missing values aren't counted, but unique() counted them
+                "unique_values": len(counts) + int(df[col].hasnans),
                 "top_values": value_counts
             }
         stats["categorical_summary"] = categorical_summary
@@ -134,82 +159,67 @@ def _generate_basic_stats(df):
     return stats
 
 
-def _generate_correlation_insights(df):
+def _generate_correlation_insights(df, numeric_cols):
     """Generate insights about correlations in the data."""
-    # Get numeric columns
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    
     # We need at least 2 numeric columns
     if len(numeric_cols) < 2:
         return None
     
     # Calculate correlation matrix
-    corr_matrix = df[numeric_cols].corr().abs()
+    corr_matrix = np.abs(correlation_matrix(df[numeric_cols].to_numpy(dtype=np.float64)))
+    
+    # Correlations of each pair of columns (upper triangle, row by row)
+    rows, cols = np.triu_indices(len(numeric_cols), k=1)
+    values = corr_matrix[rows, cols]
+    
+    def pairs(selected):
+        """Describe the first 5 selected pairs"""
+        return [
+            {
+                "col1": numeric_cols[rows[k]],
+                "col2": numeric_cols[cols[k]],
+                "correlation": round(float(values[k]), 2)
+            }
+            for k in np.flatnonzero(selected)[:5]
+        ]
     
     # Get strong correlations (above 0.7 and not self-correlations)
-    strong_correlations = []
-    for i in range(len(numeric_cols)):
-        for j in range(i+1, len(numeric_cols)):
-            if abs(corr_matrix.iloc[i, j]) > 0.7:
-                strong_correlations.append({
-                    "col1": numeric_cols[i],
-                    "col2": numeric_cols[j],
-                    "correlation": round(float(corr_matrix.iloc[i, j]), 2)
-                })
+    strong_correlations = pairs(values > 0.7)
     
     # Get weak correlations (below 0.3 but not zero)
-    weak_correlations = []
-    for i in range(len(numeric_cols)):
-        for j in range(i+1, len(numeric_cols)):
-            if 0 < abs(corr_matrix.iloc[i, j]) < 0.3:
-                weak_correlations.append({
-                    "col1": numeric_cols[i],
-                    "col2": numeric_cols[j],
-                    "correlation": round(float(corr_matrix.iloc[i, j]), 2)
-                })
+    weak_correlations = pairs((values > 0) & (values < 0.3))
     
     # Return only if we have insights
     if not strong_correlations and not weak_correlations:
         return None
     
     return {
-        "strong_correlations": strong_correlations[:5],  # Limit to top 5
-        "weak_correlations": weak_correlations[:5]  # Limit to top 5
+        "strong_correlations": strong_correlations,
+        "weak_correlations": weak_correlations
     }
 
 
-def _generate_outlier_insights(df):
+def _generate_outlier_insights(df, numeric_cols):
     """Generate insights about outliers in the data."""
-    # Get numeric columns
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    
     if not numeric_cols:
         return None
     
+    # Z-scores of every numeric column at once, ignoring missing values
+    arr = df[numeric_cols].to_numpy(dtype=np.float64)
+    counts, examples = zscore_outliers(arr, thresh=3)
+    
     outliers = {}
     
-    for col in numeric_cols:
-        # Skip columns with all same values
-        if df[col].std() == 0:
-            continue
-        
-        # Use z-score to detect outliers
-        z = np.abs(stats.zscore(df[col].dropna()))
-        outlier_indices = np.where(z > 3)[0]
+    for j in np.flatnonzero(counts):
+        # Get up to 5 outlier values, in row order
+        rows = examples[j]
+        outlier_values = arr[rows[rows >= 0], j]
         
-        if len(outlier_indices) > 0:
-            # Get outlier values
-            outlier_values = df[col].dropna().iloc[outlier_indices].tolist()
-            
-            # Limit to 5 outliers
-            if len(outlier_values) > 5:
-                outlier_values = outlier_values[:5]
-            
-            outliers[col] = {
-                "count": len(outlier_indices),
-                "percent": round(100 * len(outlier_indices) / len(df), 2),
-                "examples": [round(float(x), 2) for x in outlier_values]
-            }
+        outliers[numeric_cols[j]] = {
+            "count": int(counts[j]),
+            "percent": round(100 * int(counts[j]) / len(df), 2),
+            "examples": [round(float(x), 2) for x in outlier_values]
+        }
     
     # Return only if we have outliers
     if not outliers:
@@ -218,59 +228,58 @@ def _generate_outlier_insights(df):
     return outliers
 
 
-def _generate_trend_insights(df):
+def _generate_trend_insights(df, numeric_cols):
     """Generate insights about trends in the data."""
-    # Try to find date columns
-    date_cols = []
+    # Try to find date columns, keeping the parsed dates by column
+    dates = {}
     for col in df.columns:
         # Check if column name contains date-related keywords
         if any(kw in col.lower() for kw in ['date', 'time', 'year', 'month', 'day']):
+            # Columns that are already dates need no parsing
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                dates[col] = df[col]
+                continue
             # Try to convert to datetime
-            try:
-                df[col] = pd.to_datetime(df[col])
-                date_cols.append(col)
-            except:
-                pass
+            parsed = _parse_dates(df[col])
+            if parsed is not None:
+                dates[col] = parsed
     
-    if not date_cols:
+    if not dates:
         return None
     
     trends = {}
     
-    # Get numeric columns
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    # Date columns aren't analyzed as numbers
+    numeric_cols = [col for col in numeric_cols if col not in dates]
     
     if not numeric_cols:
         return None
     
     # Analyze trends over time
-    for date_col in date_cols:
-        for num_col in numeric_cols[:3]:  # Limit to first 3 numeric columns
-            # Group by year-month
-            try:
-                df['month'] = df[date_col].dt.to_period('M')
-                monthly_avg = df.groupby('month')[num_col].mean()
-                
-                # Check if we have enough months
-                if len(monthly_avg) < 3:
-                    continue
-                
-                # Calculate trend (simple linear regression)
-                x = np.arange(len(monthly_avg))
-                y = monthly_avg.values
-                slope, _, r_value, p_value, _ = stats.linregress(x, y)
-                
-                # Only include significant trends
-                if p_value < 0.05:
-                    trend_direction = "increasing" if slope > 0 else "decreasing"
-                    trends[f"{num_col}_over_{date_col}"] = {
-                        "direction": trend_direction,
-                        "strength": round(float(r_value), 2),
-                        "slope": round(float(slope), 2),
-                        "significance": round(float(p_value), 3)
-                    }
-            except:
-                pass  # Skip if there's an error
+    for date_col, date_values in dates.items():
+        # Group by year-month, averaging the first 3 numeric columns together
+        try:
+            months = date_values.dt.to_period('M')
+            monthly = df[numeric_cols[:3]].groupby(months, sort=True).mean()
+        except (TypeError, ValueError):
+            continue  # Skip if there's an error
+        
+        # Check if we have enough months
+        if len(monthly) < 3:
+            continue
+        
+        # Calculate trends (simple linear regression) for all columns at once
+        slope, r_value, p_value = linear_trends(monthly.to_numpy(dtype=np.float64))
+        
+        # Only include significant trends
+        for j in np.flatnonzero(p_value < 0.05):
+            trend_direction = "increasing" if slope[j] > 0 else "decreasing"
+            trends[f"{monthly.columns[j]}_over_{date_col}"] = {
+                "direction": trend_direction,
+                "strength": round(float(r_value[j]), 2),
+                "slope": round(float(slope[j]), 2),
+                "significance": round(float(p_value[j]), 3)
+            }
     
     # Return only if we have trends
     if not trends:
@@ -279,7 +288,30 @@ def _generate_trend_insights(df):
     return trends
 
 
-def _generate_custom_insights(df, prompt):
+def _parse_dates(values, min_parsed=0.9):
+    """
+    Parse a column as dates in one pass, without raising on bad values.
+    
+    Args:
+        values: Series to parse
+        min_parsed: Fraction of the non-missing values that must parse
+        
+    Returns:
+        Series: Parsed dates, or None if too few values are dates
+    """
+    try:
+        parsed = pd.to_datetime(values, errors='coerce', infer_datetime_format=True)
+    except (TypeError, ValueError):
+        # Mixed time zones can't be combined into one column
+        return None
+    
+    present = int(values.notna().sum())
+    if not present or parsed.notna().sum() < min_parsed * present:
+        return None
+    return parsed
+
+
+def _generate_custom_insights(df, prompt, numeric_cols, categorical_cols):
     """Generate custom insights based on user prompt."""
     # This function would normally use an LLM or other AI service
     # For now, we'll implement a simple version
@@ -287,12 +319,8 @@ def _generate_custom_insights(df, prompt):
     insights = []
     
     # Parse the prompt for keywords
-    prompt_lower = prompt.lower()
-    
     # Check for distribution analysis requests
-    if any(word in prompt_lower for word in ['distribution', 'histogram', 'frequency']):
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
+    if _DISTRIBUTION_RE.search(prompt):
         for col in numeric_cols[:2]:  # Limit to first 2 columns
             # Calculate distribution metrics
             mean = df[col].mean()
@@ -314,16 +342,13 @@ def _generate_custom_insights(df, prompt):
                           f"median {round(float(median), 2)}, and is {skew_text}.")
     
     # Check for comparison requests
-    if any(word in prompt_lower for word in ['compare', 'comparison', 'versus', 'vs']):
-        categorical_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
+    if _COMPARISON_RE.search(prompt):
         if categorical_cols and numeric_cols:
             cat_col = categorical_cols[0]  # Take first categorical column
             num_col = numeric_cols[0]  # Take first numeric column
             
             # Get top categories
-            top_categories = df[cat_col].value_counts().head(3).index.tolist()
+            top_categories = top_value_counts(df[cat_col], 3)[0].tolist()
             
             # Compare mean values
             comparison = {}
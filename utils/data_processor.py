@@ -6,8 +6,11 @@ for the dashboard application.
 """
 
 import os
+import io
+import logging
+import tempfile
 import csv
-import json
+import codecs
 import re
 from collections import defaultdict
 import pandas as pd
@@ -15,8 +18,15 @@ import numpy as np
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 import pickle
 
+from utils.fast_io import read_csv_fast, open_csv_batches, is_numeric_field, CSV_PARSE_ERRORS
+from utils._numeric_kernels import top_value_counts
+
+logger = logging.getLogger(__name__)
+
 # Constants
 ENCODERS_DIR = 'data/encoders'
+UPLOAD_CHUNK_SIZE = 1 << 20
+MAX_VALUE_COUNTS = 50  # Values listed per categorical column in the stats
 os.makedirs(ENCODERS_DIR, exist_ok=True)
 
 
@@ -38,24 +48,100 @@ def validate_csv(file_path):
         if os.path.getsize(file_path) == 0:
             return {'valid': False, 'message': 'File is empty.'}
         
+        # Stream the file in blocks instead of building a DataFrame
+        return _validate_csv_batches(file_path)
+    except CSV_PARSE_ERRORS:
+        # Files PyArrow can't parse are checked with pandas instead
+        return _read_and_validate(file_path)[1]
+    except Exception as e:
+        return {'valid': False, 'message': f'Error validating file: {str(e)}'}
+
+
+def _validate_csv_batches(file_path):
+    """Validate a CSV file one block of rows at a time, applying the checks of _read_and_validate."""
+    reader = open_csv_batches(file_path)
+    schema = reader.schema
+    
+    # Column count and duplicate name checks need only the header
+    header_result = validate_csv_header(schema.names)
+    if not header_result['valid']:
+        return header_result
+    
+    # Count rows and missing values per column across all blocks
+    row_count = 0
+    null_counts = [0] * len(schema)
+    for batch in reader:
+        row_count += batch.num_rows
+        for i, column in enumerate(batch.columns):
+            null_counts[i] += column.null_count
+    
+    if row_count == 0:
+        return {'valid': False, 'message': 'No data found in the file.'}
+    
+    # Check for empty columns
+    empty_cols = [name for name, nulls in zip(schema.names, null_counts) if nulls == row_count]
+    if empty_cols:
+        return {
+            'valid': False, 
+            'message': f'File contains empty columns: {", ".join(empty_cols)}'
+        }
+    
+    # Ensure there are at least some numeric columns for visualization
+    if not any(is_numeric_field(field) for field in schema):
+        return {
+            'valid': False, 
+            'message': 'File must contain at least one numeric column for visualization.'
+        }
+    
+    return {'valid': True, 'message': 'File validation successful.'}
+
+
+def prepare_dataset(file_path, save_encoders=True, encoders_dir=ENCODERS_DIR):
+    """
+    Validate an uploaded CSV file and write its Parquet cache.
+    
+    The CSV is parsed once for both steps, so later loads of a valid file
+    read the Parquet cache instead of the CSV.
+    
+    Args:
+        file_path: Path to the CSV file
+        save_encoders: Whether to save encoders for later use
+        encoders_dir: Directory to save encoders
+        
+    Returns:
+        dict: Validation result with keys 'valid' and 'message'
+    """
+    df, result = _read_and_validate(file_path)
+    if result['valid']:
+        _write_parquet_cache(_transform_frame(df, save_encoders, encoders_dir), parquet_path_for(file_path))
+    return result
+
+
+def _read_and_validate(file_path):
+    """Parse and validate a CSV file, returning the DataFrame and the validation result."""
+    if not os.path.exists(file_path):
+        return None, {'valid': False, 'message': 'File not found.'}
+    
+    try:
+        # Check if file is empty
+        if os.path.getsize(file_path) == 0:
+            return None, {'valid': False, 'message': 'File is empty.'}
+        
         # Read the CSV file
-        df = pd.read_csv(file_path)
+        df = read_csv_fast(file_path)
         
         if df.empty:
-            return {'valid': False, 'message': 'No data found in the file.'}
-        
-        # Basic column count check
-        if len(df.columns) < 2:
-            return {'valid': False, 'message': 'File must contain at least 2 columns.'}
+            return df, {'valid': False, 'message': 'No data found in the file.'}
         
-        # Check for duplicate column names
-        if len(df.columns) != len(set(df.columns)):
-            return {'valid': False, 'message': 'File contains duplicate column names.'}
+        # Column count and duplicate name checks
+        header_result = validate_csv_header(list(df.columns))
+        if not header_result['valid']:
+            return df, header_result
         
         # Check for empty columns
         empty_cols = [col for col in df.columns if df[col].isna().all()]
         if empty_cols:
-            return {
+            return df, {
                 'valid': False, 
                 'message': f'File contains empty columns: {", ".join(empty_cols)}'
             }
@@ -63,15 +149,174 @@ def validate_csv(file_path):
         # Ensure there are at least some numeric columns for visualization
         numeric_cols = df.select_dtypes(include=['number']).columns
         if len(numeric_cols) == 0:
-            return {
+            return df, {
                 'valid': False, 
                 'message': 'File must contain at least one numeric column for visualization.'
             }
         
-        return {'valid': True, 'message': 'File validation successful.'}
+        return df, {'valid': True, 'message': 'File validation successful.'}
         
     except Exception as e:
-        return {'valid': False, 'message': f'Error validating file: {str(e)}'}
+        return None, {'valid': False, 'message': f'Error validating file: {str(e)}'}
+
+
+def validate_csv_header(columns):
+    """
+    Validate the column names from the header row of a CSV file.
+    
+    Args:
+        columns: List of column names
+        
+    Returns:
+        dict: Validation result with keys 'valid' and 'message'
+    """
+    # Basic column count check
+    if len(columns) < 2:
+        return {'valid': False, 'message': 'File must contain at least 2 columns.'}
+    
+    # Check for duplicate column names
+    if len(columns) != len(set(columns)):
+        return {'valid': False, 'message': 'File contains duplicate column names.'}
+    
+    return {'valid': True, 'message': 'Header validation successful.'}
+
+
+def save_csv_stream(stream, file_path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Write a CSV stream to disk in chunks, validating the header as it arrives.
+    
+    Writing stops as soon as the header row is complete and invalid, and the
+    partial file is removed, so a bad upload is never written out in full.
+    
+    Args:
+        stream: Binary file-like object to read from
+        file_path: Path to write the CSV file to
+        chunk_size: Number of bytes to read per chunk
+        
+    Returns:
+        dict: Header validation result with keys 'valid' and 'message'
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    header_text = ''
+    header_result = None
+    
+    with open(file_path, 'wb') as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            
+            # Check the header once its first line has been received
+            if header_result is None:
+                header_text += decoder.decode(chunk)
+                if '\n' in header_text:
+                    header_result = _check_header_text(header_text)
+                    if not header_result['valid']:
+                        break
+            
+            f.write(chunk)
+    
+    # Single-line files never contain a newline
+    if header_result is None:
+        header_result = _check_header_text(header_text + decoder.decode(b'', final=True))
+    
+    if not header_result['valid']:
+        os.remove(file_path)
+    
+    return header_result
+
+
+def validate_csv_stream_header(stream, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Validate the header row at the start of a binary CSV stream.
+    
+    The stream is only read up to the end of the header row.
+    
+    Args:
+        stream: Binary file-like object positioned at the start of the file
+        chunk_size: Number of bytes to read per chunk
+        
+    Returns:
+        dict: Header validation result with keys 'valid' and 'message'
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    header_text = ''
+    
+    while '\n' not in header_text:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            header_text += decoder.decode(b'', final=True)
+            break
+        header_text += decoder.decode(chunk)
+    
+    return _check_header_text(header_text)
+
+
+def _check_header_text(text):
+    """Validate the first CSV row contained in a piece of decoded text."""
+    if not text.strip():
+        return {'valid': False, 'message': 'File is empty.'}
+    
+    columns = next(csv.reader(io.StringIO(text)), [])
+    return validate_csv_header(columns)
+
+
+def parquet_path_for(file_path):
+    """
+    Get the path of the Parquet cache kept next to a CSV file.
+    
+    Args:
+        file_path: Path to the CSV file
+        
+    Returns:
+        str: Path to the Parquet cache file
+    """
+    return os.path.splitext(file_path)[0] + '.parquet'
+
+
+def load_dataset(file_path, save_encoders=True, encoders_dir=ENCODERS_DIR):
+    """
+    Load the transformed dataset for a CSV file.
+    
+    The first load parses and transforms the CSV and writes the result to a
+    Parquet file next to it; later loads read the Parquet file instead.
+    
+    Args:
+        file_path: Path to the CSV file
+        save_encoders: Whether to save encoders for later use
+        encoders_dir: Directory to save encoders
+        
+    Returns:
+        DataFrame: Transformed data
+    """
+    cache_path = parquet_path_for(file_path)
+    
+    # Use the cache unless the CSV has been replaced since it was written
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        return pd.read_parquet(cache_path, memory_map=True)
+    
+    df = _transform_frame(read_csv_fast(file_path), save_encoders, encoders_dir)
+    _write_parquet_cache(df, cache_path)
+    
+    return df
+
+
+def _write_parquet_cache(df, cache_path):
+    """Write a transformed DataFrame to its Parquet cache file."""
+    # Write to a temporary file first so readers never see a partial cache;
+    # each writer gets its own file, so concurrent writers can't clobber it
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(cache_path) or '.', prefix=os.path.basename(cache_path) + '.', suffix='.tmp'
+    )
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        # Mixed-type columns can't be stored as Parquet; re-parse the CSV next time
+        logger.warning('Could not write Parquet cache %s', cache_path, exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 def transform_data(file_path, save_encoders=True, encoders_dir=ENCODERS_DIR):
@@ -84,52 +329,82 @@ def transform_data(file_path, save_encoders=True, encoders_dir=ENCODERS_DIR):
         encoders_dir: Directory to save encoders
         
     Returns:
-        list: Transformed data as a list of dictionaries
+        DataFrame: Transformed data
     """
-    # Read the CSV file
-    df = pd.read_csv(file_path)
+    return load_dataset(file_path, save_encoders, encoders_dir)
+
+
+def transform_data_records(file_path, save_encoders=True, encoders_dir=ENCODERS_DIR):
+    """
+    Transform CSV data into records for JSON responses.
     
-    # Remove rows with all NaN values
-    df = df.dropna(how='all')
+    Only use this where rows are serialized; analysis functions take the
+    DataFrame from transform_data directly.
     
-    # Fill NaN values
-    for col in df.columns:
-        if pd.api.types.is_numeric_dtype(df[col]):
-            # Fill numeric columns with median
-            df[col] = df[col].fillna(df[col].median())
-        else:
-            # Fill categorical columns with 'Unknown'
-            df[col] = df[col].fillna('Unknown')
+    Args:
+        file_path: Path to the CSV file
+        save_encoders: Whether to save encoders for later use
+        encoders_dir: Directory to save encoders
+        
+    Returns:
+        list: Transformed data as a list of dictionaries
+    """
+    # Convert to list of dictionaries
+    return transform_data(file_path, save_encoders, encoders_dir).to_dict(orient='records')
+
+
+def split_columns_by_type(df):
+    """
+    Split the columns of a DataFrame into numeric and other columns.
     
-    # Identify categorical columns (non-numeric with few unique values)
-    categorical_cols = []
-    for col in df.columns:
-        if not pd.api.types.is_numeric_dtype(df[col]) and df[col].nunique() < 20:
-            categorical_cols.append(col)
+    Numeric matches pd.api.types.is_numeric_dtype (including booleans), but
+    reads the dtypes once instead of inspecting each column.
+    
+    Args:
+        df: DataFrame to inspect
+        
+    Returns:
+        tuple: Lists of numeric and non-numeric column names
+    """
+    numeric_mask = df.dtypes.map(lambda dtype: dtype.kind in 'biufc').to_numpy(dtype=bool)
+    return df.columns[numeric_mask].tolist(), df.columns[~numeric_mask].tolist()
+
+
+def _transform_frame(df, save_encoders, encoders_dir):
+    """Clean a freshly parsed DataFrame and build its categorical encoders."""
+    # Remove rows with all NaN values, skipping the copy when there are none
+    if df.isna().all(axis=1).any():
+        df = df.dropna(how='all')
     
     # Identify numeric columns
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    numeric_cols, other_cols = split_columns_by_type(df)
+    
+    # Fill NaN values, each column type in one operation
+    if numeric_cols:
+        # Fill numeric columns with median
+        df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
+    if other_cols:
+        # Fill categorical columns with 'Unknown'
+        df[other_cols] = df[other_cols].fillna('Unknown')
     
     # Store encoders
     encoders = {}
     
-    # Encode categorical columns
-    for col in categorical_cols:
-        # Get unique values for the column
-        unique_values = df[col].unique().tolist()
-        
-        # Create an encoder
-        encoder = {value: i for i, value in enumerate(unique_values)}
-        encoders[col] = encoder
+    # Encode categorical columns (non-numeric with few unique values). Each
+    # encoder is the Index of the column's values in order of appearance, so
+    # a value's code is its position: uniques.get_indexer([value])
+    for col in other_cols:
+        _, uniques = pd.factorize(df[col])
+        if len(uniques) < 20:
+            encoders[col] = uniques
     
     # Save encoders if requested
     if save_encoders:
         os.makedirs(encoders_dir, exist_ok=True)
         with open(os.path.join(encoders_dir, 'encoders.pkl'), 'wb') as f:
-            pickle.dump(encoders, f)
+            pickle.dump(encoders, f, protocol=pickle.HIGHEST_PROTOCOL)
     
-    # Convert to list of dictionaries
-    return df.to_dict(orient='records')
+    return df.reset_index(drop=True)
 
 
 def analyze_data(data):
@@ -137,55 +412,77 @@ def analyze_data(data):
     Analyze data to extract statistics and filter options.
     
     Args:
-        data: List of dictionaries containing the data
+        data: DataFrame or list of dictionaries containing the data
         
     Returns:
-        dict: Analysis results including statistics and filter options
+        dict: Analysis results including statistics, filter options and
+            the names of the numeric and categorical columns
     """
-    if not data:
-        return {'stats': {}, 'filter_options': {}}
-    
     # Convert to DataFrame for easier analysis
-    df = pd.DataFrame(data)
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    
+    if df.empty:
+        return {'stats': {}, 'filter_options': {}, 'numeric_cols': [], 'categorical_cols': []}
     
     # Initialize stats dictionary
     stats = {}
     filter_options = {}
     
-    # Analyze each column
-    for col in df.columns:
-        # Check if column is numeric
-        is_numeric = pd.api.types.is_numeric_dtype(df[col])
+    # Split columns by type
+    numeric_cols, categorical_cols = split_columns_by_type(df)
+    
+    # Numeric column stats, each reduced over all numeric columns in one call
+    if numeric_cols:
+        numeric = df[numeric_cols]
+        summary = pd.DataFrame({
+            'min': numeric.min(),
+            'max': numeric.max(),
+            'mean': numeric.mean(),
+            'median': numeric.median(),
+            'std': numeric.std(),
+            'unique_values': numeric.nunique()
+        }).reindex(numeric_cols)
         
-        if is_numeric:
-            # Numeric column stats
+        for col, col_min, col_max, mean, median, std, unique_values in summary.itertuples(name=None):
             stats[col] = {
                 'type': 'numeric',
-                'min': float(df[col].min()),
-                'max': float(df[col].max()),
-                'mean': float(df[col].mean()),
-                'median': float(df[col].median()),
-                'std': float(df[col].std()),
-                'unique_values': int(df[col].nunique())
+                'min': float(col_min),
+                'max': float(col_max),
+                'mean': float(mean),
+                'median': float(median),
+                'std': float(std),
+                'unique_values': int(unique_values)
             }
-        else:
-            # Categorical column stats
-            value_counts = df[col].value_counts().to_dict()
-            
-            # Convert any non-string keys to strings for JSON compatibility
-            value_counts = {str(k): int(v) for k, v in value_counts.items()}
-            
-            stats[col] = {
-                'type': 'categorical',
-                'unique_values': int(df[col].nunique()),
-                'value_counts': value_counts
-            }
-            
-            # Add to filter options if it has a reasonable number of unique values
-            if df[col].nunique() < 20:
-                filter_options[col] = sorted(df[col].unique().tolist())
+    
+    for col in categorical_cols:
+        # Categorical column stats, keeping only the most frequent values;
+        # missing values aren't counted, just like nunique, so the number of
+        # counts is the number of distinct values
+        top_values, top_counts, counts = top_value_counts(df[col], MAX_VALUE_COUNTS)
+        unique_values = len(counts)
+        
+        # Convert any non-string keys to strings for JSON compatibility
+        value_counts = {str(k): v for k, v in zip(top_values.tolist(), top_counts.tolist())}
+        
+        stats[col] = {
+            'type': 'categorical',
+            'unique_values': unique_values,
+            'value_counts': value_counts,
+            # value_counts is ordered by frequency, so the first key is the mode
+            'top_value': next(iter(value_counts), None),
+            'count': int(counts.sum())
+        }
+        
+        # Add to filter options if it has a reasonable number of unique values
+        if unique_values < 20:
+            filter_options[col] = sorted(df[col].unique().tolist())
+    
+    # Keep the stats in column order
+    stats = {col: stats[col] for col in df.columns}
     
     return {
         'stats': stats,
-        'filter_options': filter_options
+        'filter_options': filter_options,
+        'numeric_cols': numeric_cols,
+        'categorical_cols': categorical_cols
     } 
\ No newline at end of file
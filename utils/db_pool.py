@@ -0,0 +1,148 @@
+"""
+Database Pool Module
+
+This module provides a thread-safe pool of SQLite connections
+shared by the request handlers of the dashboard application.
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections opened in WAL mode.
+
+    Connections are opened on demand up to max_size and reused afterwards,
+    so requests skip the open and PRAGMA setup. When every connection is
+    checked out, acquire waits for one to be released.
+    """
+
+    def __init__(self, database, max_size=10, timeout=30):
+        """
+        Create an empty pool.
+
+        Args:
+            database: Path to the SQLite database file
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection before failing
+        """
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        # LIFO hands out the most recently used connection, whose cache is warmest
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._waits = 0
+        # Connections inherited across a fork, kept alive so they're never closed
+        self._abandoned = []
+
+    def acquire(self):
+        """
+        Check out a connection, opening a new one while the pool has room.
+
+        Returns:
+            sqlite3.Connection: Connection for the caller's exclusive use
+
+        Raises:
+            queue.Empty: If no connection is released within the timeout
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.max_size
+            if can_open:
+                self._opened += 1
+            else:
+                self._waits += 1
+
+        if not can_open:
+            return self._idle.get(timeout=self.timeout)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and releases it on exit."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """
+        Close every idle connection and forget it.
+        
+        Call this before the process forks (e.g. after startup work at import
+        time), so no child starts out holding the parent's connections.
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def reset(self):
+        """
+        Forget every connection without closing it, for use in a forked child.
+        
+        SQLite connections must not be used across a fork, and closing the
+        parent's connections from the child could disturb the parent's WAL
+        files, so they are kept referenced (never closed) and new ones are
+        opened on demand.
+        """
+        self._abandoned.append(self._idle)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._waits = 0
+
+    def health(self):
+        """
+        Report how the pool is being used.
+
+        Returns:
+            dict: Pool size, open, idle and in-use connections, and the number
+                of times a caller had to wait for a connection
+        """
+        idle = self._idle.qsize()
+        return {
+            'max_size': self.max_size,
+            'open': self._opened,
+            'idle': idle,
+            'in_use': self._opened - idle,
+            'waits': self._waits
+        }
+
+    def _connect(self):
+        """Open and configure a new connection."""
+        # Long-lived connections keep their prepared statements, keyed by SQL text
+        conn = sqlite3.connect(self.database, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers proceed while a write is in progress
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-64000')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
@@ -0,0 +1,82 @@
+"""
+Fast I/O Module
+
+This module provides faster file readers for the dashboard application,
+using PyArrow's multi-threaded CSV parser where possible.
+"""
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+# Bytes handed to each parser thread at a time
+CSV_BLOCK_SIZE = 8 << 20
+
+# Errors raised when PyArrow can't parse a CSV file that pandas may still read
+CSV_PARSE_ERRORS = (pa.ArrowInvalid, pa.ArrowNotImplementedError)
+
+
+def read_csv_fast(file_path):
+    """
+    Read a CSV file into a DataFrame with the PyArrow CSV parser.
+
+    Columns that PyArrow would parse as dates or times are kept as text, so
+    the result has the same dtypes as pd.read_csv. Files PyArrow can't parse
+    are read with pandas instead.
+
+    Args:
+        file_path: Path to the CSV file
+
+    Returns:
+        DataFrame: Parsed data
+    """
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE)
+
+    try:
+        table = pa_csv.read_csv(
+            file_path,
+            read_options=read_options,
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True)
+        )
+
+        # pandas leaves dates as strings; re-read those columns as text to match
+        temporal_cols = [field.name for field in table.schema if pa.types.is_temporal(field.type)]
+        if temporal_cols:
+            table = pa_csv.read_csv(
+                file_path,
+                read_options=read_options,
+                convert_options=pa_csv.ConvertOptions(
+                    strings_can_be_null=True,
+                    column_types={col: pa.string() for col in temporal_cols}
+                )
+            )
+    except CSV_PARSE_ERRORS:
+        return pd.read_csv(file_path, memory_map=True)
+
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def open_csv_batches(file_path):
+    """
+    Open a CSV file for reading one block of rows at a time.
+    
+    Column types are inferred from the first block; a later block that
+    doesn't fit them raises one of CSV_PARSE_ERRORS while iterating.
+    
+    Args:
+        file_path: Path to the CSV file
+        
+    Returns:
+        pyarrow.csv.CSVStreamingReader: Reader with a schema attribute that
+            yields RecordBatch objects
+    """
+    return pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(strings_can_be_null=True)
+    )
+
+
+def is_numeric_field(field):
+    """Check whether an Arrow field holds a type pandas treats as a number."""
+    return pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
@@ -5,35 +5,54 @@ This module handles model training and evaluation
 for the dashboard application.
 """
 
+import copy
 import os
 import pickle
+import threading
 import numpy as np
 import pandas as pd
+from cachetools import LRUCache
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
 from sklearn.impute import SimpleImputer
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LinearRegression, LogisticRegression
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.ensemble import GradientBoostingRegressor, GradientBoostingClassifier
 from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, f1_score, precision_score, recall_score
 
+from utils.data_processor import split_columns_by_type
+
+# Rows hashed to fingerprint training data for the cache below
+FINGERPRINT_ROWS = 1024
+
+# Prepared splits of recent training data, keyed by _prepared_key
+_prepared_splits = LRUCache(maxsize=8)
+_prepared_lock = threading.Lock()
+
 
 def train_model(data, target_column, model_type='classifier', preprocessing=None, exclude_columns=None):
     """
     Train a machine learning model on the provided data.
     
     Args:
-        data: List of dictionaries containing the data
+        data: DataFrame or list of dictionaries containing the data
         target_column: Column to predict
         model_type: Type of model ('classifier' or 'regressor')
-        preprocessing: Dictionary of preprocessing options
+        preprocessing: Dictionary of preprocessing options ('handle_unknown',
+            default 'ignore'; 'handle_missing'; 'encode_categorical';
+            'target_type')
         exclude_columns: List of columns to exclude from training
         
     Returns:
-        dict: Training results including model, features, and metrics
+        dict: Training results including the model, feature names, and the
+            train and test splits (features as DataFrames, targets as arrays
+            or Series). The splits are cached and shared between calls on the
+            same data, so callers must not modify them.
     """
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    # Convert to DataFrame if needed
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
     
     # Ensure target column exists
     if target_column not in df.columns:
@@ -43,7 +62,8 @@ def train_model(data, target_column, model_type='classifier', preprocessing=None
     if preprocessing is None:
         preprocessing = {}
     
-    handle_unknown = preprocessing.get('handle_unknown', 'error')
+    # Categories missing from the training split are encoded as all zeros
+    handle_unknown = preprocessing.get('handle_unknown', 'ignore')
     handle_missing = preprocessing.get('handle_missing', True)
     encode_categorical = preprocessing.get('encode_categorical', True)
     target_type = preprocessing.get('target_type', None)
@@ -62,61 +82,23 @@ def train_model(data, target_column, model_type='classifier', preprocessing=None
     elif target_type == 'categorical' and model_type.lower() in ['regressor', 'regression']:
         model_type = 'classifier'
     
-    # Create a copy of the target
-    y = df[target_column].copy()
-    
-    # Encode target if it's a classifier
-    if model_type.lower() in ['classifier', 'classification']:
-        if not pd.api.types.is_numeric_dtype(y):
-            label_encoder = LabelEncoder()
-            y = label_encoder.fit_transform(y)
-    
-    # Create features set (X)
-    exclude_cols = [target_column]
-    if exclude_columns:
-        exclude_cols.extend(exclude_columns)
-    
-    X = df.drop(columns=exclude_cols, errors='ignore')
+    is_classifier = model_type.lower() in ['classifier', 'classification']
     
-    # Get column names
-    feature_names = X.columns.tolist()
+    # Encode, split and preprocess the data, reusing the result of an earlier
+    # call on the same data with the same options (e.g. retraining with new
+    # hyperparameters)
+    key = _prepared_key(df, target_column, is_classifier, exclude_columns, handle_unknown, handle_missing, encode_categorical)
+    prepared = None
+    if key is not None:
+        with _prepared_lock:
+            prepared = _prepared_splits.get(key)
+    if prepared is None:
+        prepared = _prepare_splits(df, target_column, is_classifier, exclude_columns, handle_unknown, handle_missing, encode_categorical)
+        if key is not None:
+            with _prepared_lock:
+                _prepared_splits[key] = prepared
     
-    # Identify categorical and numeric features
-    categorical_cols = []
-    numeric_cols = []
-    
-    for col in feature_names:
-        if pd.api.types.is_numeric_dtype(X[col]):
-            numeric_cols.append(col)
-        else:
-            categorical_cols.append(col)
-    
-    # Create preprocessing pipeline
-    # 1. Handle missing values
-    if handle_missing:
-        # For numeric features
-        if numeric_cols:
-            # Replace numeric missing values with median
-            X[numeric_cols] = X[numeric_cols].fillna(X[numeric_cols].median())
-        
-        # For categorical features
-        if categorical_cols:
-            # Replace categorical missing values with 'Unknown'
-            X[categorical_cols] = X[categorical_cols].fillna('Unknown')
-    
-    # 2. Encode categorical features
-    if encode_categorical and categorical_cols:
-        # Get dummies for categorical columns
-        X_encoded = pd.get_dummies(X, columns=categorical_cols, drop_first=False)
-        
-        # Update feature names
-        feature_names = X_encoded.columns.tolist()
-        
-        # Replace X with encoded version
-        X = X_encoded
-    
-    # Split data into train and test sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test, preprocessor, X_train_processed = prepared
     
     # Create model based on type
     if model_type.lower() in ['classifier', 'classification']:
@@ -134,50 +116,134 @@ def train_model(data, target_column, model_type='classifier', preprocessing=None
         else:
             model = LinearRegression()
     
-    # Train model
-    model.fit(X_train, y_train)
-    
-    # Convert test data back to original format for evaluation
-    test_data = pd.DataFrame(X_test)
-    test_data[target_column] = y_test
-    test_data = test_data.to_dict(orient='records')
+    # Tree ensembles split on float32 values; convert numeric features once
+    # here rather than having fit check and copy the float64 matrix. Linear
+    # models keep float64 for numerical accuracy
+    tree_models = (RandomForestClassifier, RandomForestRegressor, GradientBoostingClassifier, GradientBoostingRegressor)
+    if isinstance(model, tree_models) and X_train_processed.dtype.kind in 'biuf':
+        X_train_processed = X_train_processed.astype(np.float32)
     
-    # Convert train data back to original format
-    train_data = pd.DataFrame(X_train)
-    train_data[target_column] = y_train
-    train_data = train_data.to_dict(orient='records')
+    # Train model on the preprocessed features, then bundle it with its own
+    # copy of the fitted preprocessing (the cached one must stay in step with
+    # the cached features even if the returned pipeline is refit)
+    model.fit(X_train_processed, y_train)
+    preprocessor = copy.deepcopy(preprocessor)
+    model = Pipeline([('preprocess', preprocessor), ('model', model)])
+    feature_names = preprocessor.get_feature_names_out().tolist()
     
+    # Hand the splits back as-is; evaluate_model takes them directly
     return {
         'model': model,
         'features': feature_names,
-        'test_data': test_data,
-        'train_data': train_data,
+        'X_train': X_train,
+        'y_train': y_train,
+        'X_test': X_test,
+        'y_test': y_test,
         'model_type': model_type
     }
 
 
-def evaluate_model(model, test_data, target_column):
+def _prepared_key(df, target_column, is_classifier, exclude_columns, handle_unknown, handle_missing, encode_categorical):
+    """
+    Build the cache key for the prepared splits of a DataFrame.
+    
+    The data is fingerprinted by its shape, columns, dtypes and a hash of up
+    to FINGERPRINT_ROWS evenly spaced rows (always including the first and
+    last), so equal data passed in a new object still hits the cache without
+    hashing every row. An edit confined to unsampled rows of the same shape
+    isn't detected; the dashboard retrains on whole datasets, which don't
+    change in place. Returns None if the values can't be hashed.
+    """
+    sample = np.unique(np.linspace(0, len(df) - 1, num=min(len(df), FINGERPRINT_ROWS)).astype(np.intp))
+    try:
+        fingerprint = int(pd.util.hash_pandas_object(df.iloc[sample], index=True).sum())
+    except TypeError:
+        return None
+    return (
+        fingerprint, df.shape, tuple(df.columns), tuple(map(str, df.dtypes)), target_column, is_classifier,
+        tuple(exclude_columns or ()), handle_unknown, handle_missing, encode_categorical
+    )
+
+
+def _prepare_splits(df, target_column, is_classifier, exclude_columns, handle_unknown, handle_missing, encode_categorical):
+    """
+    Encode the target, split the data and fit the feature preprocessing.
+    
+    Returns:
+        tuple: X_train, X_test, y_train, y_test, the fitted preprocessor and
+            the preprocessed training features
+    """
+    # Create a copy of the target
+    y = df[target_column].copy()
+    
+    # Encode target if it's a classifier
+    if is_classifier:
+        if not pd.api.types.is_numeric_dtype(y):
+            label_encoder = LabelEncoder()
+            y = label_encoder.fit_transform(y)
+    
+    # Create features set (X)
+    exclude_cols = [target_column]
+    if exclude_columns:
+        exclude_cols.extend(exclude_columns)
+    
+    X = df.drop(columns=exclude_cols, errors='ignore')
+    
+    # Identify categorical and numeric features
+    numeric_cols, categorical_cols = split_columns_by_type(X)
+    
+    # Create preprocessing pipeline
+    # 1. Handle missing values: numeric features get the median; the encoder
+    # gives missing categorical values a category of their own
+    numeric_step = SimpleImputer(strategy='median') if handle_missing else 'passthrough'
+    
+    # 2. Encode categorical features as sparse one-hot columns
+    if encode_categorical:
+        categorical_step = OneHotEncoder(handle_unknown=handle_unknown, sparse=True)
+    else:
+        categorical_step = 'passthrough'
+    
+    preprocessor = ColumnTransformer(
+        [('num', numeric_step, numeric_cols), ('cat', categorical_step, categorical_cols)],
+        verbose_feature_names_out=False
+    )
+    
+    # Split data into train and test sets
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    # Fit the preprocessing on the training split only
+    X_train_processed = preprocessor.fit_transform(X_train, y_train)
+    
+    return X_train, X_test, y_train, y_test, preprocessor, X_train_processed
+
+
+def evaluate_model(model, X_test, y_test, feature_names=None):
     """
     Evaluate a trained model on test data.
     
     Args:
         model: Trained model
-        test_data: Test data as list of dictionaries
-        target_column: Target column name
+        X_test: Test features as a DataFrame or array
+        y_test: Test target values
+        feature_names: Names of the model's input features; defaults to the
+            preprocessing output names for a Pipeline, or the columns of X_test
         
     Returns:
         dict: Evaluation metrics
     """
-    # Convert to DataFrame
-    df = pd.DataFrame(test_data)
-    
-    # Split features and target
-    y_true = df[target_column]
-    X_test = df.drop(columns=[target_column])
+    y_true = y_test
     
     # Make predictions
     y_pred = model.predict(X_test)
     
+    # Models from train_model carry their preprocessing; inspect the estimator itself
+    if isinstance(model, Pipeline):
+        if feature_names is None:
+            feature_names = model.named_steps['preprocess'].get_feature_names_out()
+        model = model.steps[-1][1]
+    elif feature_names is None:
+        feature_names = X_test.columns
+    
     # Calculate metrics based on model type
     metrics = {}
     
@@ -202,39 +268,21 @@ def evaluate_model(model, test_data, target_column):
     
     # Calculate feature importance if available
     feature_importance = {}
+    importance = None
     
     if hasattr(model, 'feature_importances_'):
-        feature_names = X_test.columns
         importance = model.feature_importances_
-        
-        # Create a dictionary of feature importances
-        for i, feature in enumerate(feature_names):
-            feature_importance[feature] = float(importance[i])
-        
-        # Sort by importance
-        feature_importance = dict(sorted(
-            feature_importance.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        ))
     elif hasattr(model, 'coef_'):
-        feature_names = X_test.columns
         importance = np.abs(model.coef_)
         
         # Handle multi-class coefficients
         if importance.ndim > 1:
             importance = np.mean(importance, axis=0)
-        
-        # Create a dictionary of feature importances
-        for i, feature in enumerate(feature_names):
-            feature_importance[feature] = float(importance[i])
-        
-        # Sort by importance
-        feature_importance = dict(sorted(
-            feature_importance.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        ))
+    
+    if importance is not None:
+        # Build the dictionary already sorted by importance
+        order = np.argsort(-importance, kind='stable')
+        feature_importance = dict(zip(np.asarray(feature_names)[order].tolist(), importance[order].tolist()))
     
     return {
         'metrics': metrics,